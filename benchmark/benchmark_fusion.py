@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_fusion
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 14:00
+# Description   : 多层wraps_ori/wraps_add_multi叠加时，开启和关闭跳板函数合并的栈深度和调用开销
+"""
+import sys
+import timeit
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import wraps_ori, wraps_add_multi  # noqa: E402
+from movoid_function.decorator import WRAPS_CONFIG  # noqa: E402
+
+
+def frame_depth():
+    frame = sys._getframe(1)
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+measure_depth = False
+
+
+def target(a, b=2, *, c=3):
+    return frame_depth() if measure_depth else a
+
+
+def ori_dec(func):
+    @wraps_ori(func)
+    def wrapper(*args, **kwargs):
+        pass
+
+    return wrapper
+
+
+def add_dec(index):
+    def dec(func):
+        return wraps_add_multi([f'p{index}', index])(func)
+
+    return dec
+
+
+def main(number=300_000):
+    global measure_depth
+    measure_depth = True
+    base_depth = target(1)
+    print(f'{"case":<28}{"frames":>8}{"ns/call":>10}')
+    for layer in (1, 2, 4, 8):
+        for fusion in (False, True):
+            WRAPS_CONFIG.fusion = fusion
+            for name, dec_maker in (('wraps_ori', lambda i: ori_dec), ('wraps_add_multi', add_dec)):
+                func = target
+                for i in range(layer):
+                    func = dec_maker(i)(func)
+                measure_depth = True
+                frames = func(1) - base_depth
+                measure_depth = False
+                cost = min(timeit.repeat(lambda: func(1, c=4), number=number, repeat=5)) / number * 1e9
+                print(f'{name + " x" + str(layer) + (" fused" if fusion else ""):<28}{frames:>8}{cost:>10.1f}')
+    WRAPS_CONFIG.fusion = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_lazy
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 17:00
+# Description   : 普通模式和延迟装饰模式下，装饰大量函数所需的时间，以及第一次调用时的额外开销
+"""
+import sys
+import time
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import wraps  # noqa: E402
+from movoid_function.decorator import WRAPS_CONFIG, SIGNATURE_CACHE  # noqa: E402
+
+
+def dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def make_functions(number):
+    namespace = {}
+    for index in range(number):
+        exec(f'def func_{index}(self, a, b={index}, *args, c=None, **kwargs):\n    return a\n', namespace)
+    return [namespace[f'func_{_}'] for _ in range(number)]
+
+
+def main(number=5_000, called=0.1):
+    print(f'{"mode":<8}{"decorate ms":>14}{"first call ms":>16}')
+    for lazy in (False, True):
+        functions = make_functions(number)
+        SIGNATURE_CACHE.clear()
+        WRAPS_CONFIG.lazy = lazy
+        start = time.perf_counter()
+        wrapped = [dec(_) for _ in functions]
+        decorate_cost = time.perf_counter() - start
+        WRAPS_CONFIG.lazy = False
+        start = time.perf_counter()
+        for func in wrapped[:int(number * called)]:
+            func(None, 1)
+        call_cost = time.perf_counter() - start
+        print(f'{"lazy" if lazy else "normal":<8}{decorate_cost * 1000:>14.1f}{call_cost * 1000:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_memory
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 16:00
+# Description   : 大量函数被wraps装饰时，普通模式和紧凑模式下每个被装饰函数占用的内存
+"""
+import gc
+import sys
+import tracemalloc
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import wraps  # noqa: E402
+from movoid_function.decorator import WRAPS_CONFIG, SIGNATURE_CACHE  # noqa: E402
+
+SHAPES = (
+    'self, request, *args, **kwargs',
+    'a, b=1, *, c=2',
+    'name: str, value: int = 0',
+    'x',
+)
+
+
+def dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def make_functions(number):
+    namespace = {}
+    for index in range(number):
+        source = f'def func_{index}({SHAPES[index % len(SHAPES)]}):\n    """function {index % 16}"""\n    return None\n'
+        exec(source, namespace)
+    return [namespace[f'func_{_}'] for _ in range(number)]
+
+
+def measure(functions, compact):
+    WRAPS_CONFIG.compact = compact
+    SIGNATURE_CACHE.clear()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    wrapped = [dec(_) for _ in functions]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    SIGNATURE_CACHE.clear()
+    gc.collect()
+    after_clear = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    WRAPS_CONFIG.compact = False
+    return wrapped, (after - before) / len(functions), (after - after_clear) / len(functions)
+
+
+def main(number=20_000):
+    functions = make_functions(number)
+    # 先装饰一遍，避免把签名缓存等一次性的开销算进去
+    measure(functions[:len(SHAPES)], False)
+    measure(functions[:len(SHAPES)], True)
+    # bytes/function包含装饰后依然留在SIGNATURE_CACHE中的部分，signature cache为其中缓存所占的部分
+    print(f'{"mode":<12}{"bytes/function":>16}{"signature cache":>18}')
+    for compact in (False, True):
+        wrapped, cost, cache_cost = measure(functions, compact)
+        print(f'{"compact" if compact else "normal":<12}{cost:>16.0f}{cache_cost:>18.0f}')
+        del wrapped
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_replace
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 23:00
+# Description   : 被replace_function替换后的函数，每次调用的额外开销
+"""
+import sys
+import timeit
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import ReplaceFunction  # noqa: E402
+
+
+def origin(a, b=1):
+    return a + b
+
+
+def target(a, b=2):
+    return a * b
+
+
+def main(number=200_000):
+    print(f'{"case":<24}{"us per call":>14}')
+    cost = timeit.timeit(lambda: origin(1, 2), number=number)
+    print(f'{"direct":<24}{cost / number * 1e6:>14.3f}')
+    replaced = ReplaceFunction(origin, target)
+    cost = timeit.timeit(lambda: replaced(1, 2), number=number)
+    print(f'{"replace":<24}{cost / number * 1e6:>14.3f}')
+    replaced = ReplaceFunction(origin, target, setup=0, teardown=0)
+    cost = timeit.timeit(lambda: replaced(1, 2), number=number)
+    print(f'{"replace setup teardown":<24}{cost / number * 1e6:>14.3f}')
+    replaced = ReplaceFunction(origin, target)
+    replaced.set_route({0: 95, 1: 5})
+    cost = timeit.timeit(lambda: replaced(1, 2), number=number)
+    print(f'{"replace routed 95/5":<24}{cost / number * 1e6:>14.3f}')
+
+
+if __name__ == '__main__':
+    main()
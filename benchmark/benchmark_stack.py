@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_stack
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 19:00
+# Description   : 在有多层装饰器的调用栈中，STACK获取栈信息的开销，模拟日志中每一行都获取调用位置的场景
+"""
+import sys
+import timeit
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import STACK, wraps, stack  # noqa: E402
+
+
+def log_dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def nested(depth, func):
+    if depth <= 0:
+        return func()
+    return nested(depth - 1, func)
+
+
+@log_dec
+@log_dec
+def log_line():
+    return STACK.get_frame(1).info(stack.PathFunction)
+
+
+@log_dec
+def log_list():
+    return len(STACK.get_frame_list())
+
+
+def main(number=5_000):
+    print(f'{"case":<32}{"us/call":>10}')
+    for depth in (0, 20):
+        for name, func in (('get_frame + info', log_line), ('get_frame_list', log_list)):
+            cost = min(timeit.repeat(lambda: nested(depth, func), number=number, repeat=5)) / number * 1e6
+            print(f'{name + " depth " + str(depth):<32}{cost:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : benchmark_wraps
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 10:00
+# Description   : 对比functools.wraps和movoid_function.wraps装饰后函数的调用开销
+"""
+import functools
+import sys
+import timeit
+
+sys.path.insert(0, str(__import__('pathlib').Path(__file__).absolute().parent.parent))
+
+from movoid_function import wraps, wraps_ori  # noqa: E402
+
+
+def target_fixed(a, b=2, c=3):
+    return a
+
+
+def target_var(a, b=2, *args, c=3, **kwargs):
+    return a
+
+
+def functools_dec(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def movoid_dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def movoid_ori_dec(func):
+    @wraps_ori(func)
+    def wrapper(*args, **kwargs):
+        pass
+
+    return wrapper
+
+
+def main(number=1_000_000):
+    print(f'{"case":<36}{"ns/call":>10}{"overhead":>12}')
+    for target, call_args, call_kwargs in (
+            (target_fixed, (1, 2), {'c': 4}),
+            (target_var, (1, 2, 3), {'c': 4, 'd': 5}),
+    ):
+        cases = {
+            'bare': target,
+            'functools.wraps': functools_dec(target),
+            'movoid wraps': movoid_dec(target),
+            'movoid wraps_ori': movoid_ori_dec(target),
+        }
+        base = None
+        for name, func in cases.items():
+            cost = min(timeit.repeat(lambda: func(*call_args, **call_kwargs), number=number, repeat=5)) / number * 1e9
+            base = cost if base is None else base
+            print(f'{target.__name__ + " " + name:<36}{cost:>10.1f}{cost - base:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
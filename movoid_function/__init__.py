@@ -10,8 +10,11 @@
 from .decorator import (wraps, wraps_kw, wraps_func,
                         wraps_ori, wraps_add_one, wraps_add_multi,
                         analyse_args_kw_value_from_function, get_parameter_kind_list_from_function,
-                        reset_function_default_value, analyse_args_value_from_function, adapt_call,
-                        decorate_class_function_include, decorate_class_function_exclude, decorator_class_including_parents)
-from .function import Function, ReplaceFunction, replace_function, restore_function
+                        reset_function_default_value, analyse_args_value_from_function, adapt_call, adapt_map,
+                        decorate_class_function_include, decorate_class_function_exclude, decorator_class_including_parents,
+                        SIGNATURE_CACHE, BINDING_PLAN_CACHE)
+from .function import Function, ReplaceFunction, ReplaceTransaction, replace_function, restore_function
 from .type import check_parameters_type
-from .stack import STACK, StackFrame
+from .profiler import DECORATION_PROFILER
+from .stack import STACK, StackFrame, FrameSnapshot
+from .logger import StackLogger, use_stack_caller
@@ -7,11 +7,19 @@
 # Description   : 
 """
 import inspect
+import itertools
+import os
 import re
+import sys
+import textwrap
+import threading
+import weakref
+from collections import OrderedDict, deque
 from inspect import Parameter, Signature
-from types import CodeType, FunctionType
-from typing import Union, Dict, List
+from types import CellType, CodeType, FunctionType, MethodType
+from typing import Union, Dict, List, Tuple
 
+from .profiler import DECORATION_PROFILER
 from .stack import STACK
 
 builtin_function_args_dict = {
@@ -28,34 +36,136 @@ builtin_function_args_dict = {
 }
 
 
-def get_args_dict_from_function(func) -> Dict[str, Dict[str, Parameter]]:
+class SignatureInfo:
     """
-    获得函数的参数分类，一共分成四类，返回一个4键值的dict
-    :param func: 目标函数
-    :return: key分别是arg、args、kwarg、kwargs的dict
+    一个函数的参数解析结果，解析一次后即可被反复使用
+    其中的dict和list是共享的，请勿直接修改
     """
-    re_dict = {
-        'arg': {},
-        'args': {},
-        'kwarg': {},
-        'kwargs': {}
-    }
-    try:
-        for i, v in Signature.from_callable(func).parameters.items():
+    __slots__ = ('signature', 'parameters', 'args_dict', 'kind_list', 'refs')
+
+    def __init__(self, signature: Signature, refs=()):
+        self.signature = signature
+        self.parameters = tuple(signature.parameters.values())
+        self.args_dict: Dict[str, Dict[str, Parameter]] = {'arg': {}, 'args': {}, 'kwarg': {}, 'kwargs': {}}
+        self.kind_list: List[List[Parameter]] = [[], [], [], [], []]
+        self.refs = refs
+        for v in self.parameters:
             if v.kind == Parameter.VAR_KEYWORD:
-                re_dict['kwargs'][i] = v
+                self.args_dict['kwargs'][v.name] = v
+                self.kind_list[4].append(v)
             elif v.kind == Parameter.VAR_POSITIONAL:
-                re_dict['args'][i] = v
+                self.args_dict['args'][v.name] = v
+                self.kind_list[2].append(v)
             elif v.kind == Parameter.KEYWORD_ONLY:
-                re_dict['kwarg'][i] = v
+                self.args_dict['kwarg'][v.name] = v
+                self.kind_list[3].append(v)
+            elif v.kind == Parameter.POSITIONAL_ONLY:
+                self.args_dict['arg'][v.name] = v
+                self.kind_list[0].append(v)
             else:
-                re_dict['arg'][i] = v
-    except Exception as e:
-        if func.__name__ in builtin_function_args_dict:
-            return builtin_function_args_dict[func.__name__]
+                self.args_dict['arg'][v.name] = v
+                self.kind_list[1].append(v)
+
+
+class SignatureCache:
+    """
+    函数参数解析的缓存，以函数的code为key，再区分默认值、注释等，code被回收后缓存会自动删除
+    只缓存python函数和绑定方法，其他的callable每次都会重新解析
+    最多缓存max_size个code，超过时删除最久没有使用的，避免模块级函数被装饰后缓存一直占用内存
+    """
+    max_variants = 8
+    max_size = 1024
+
+    def __init__(self):
+        self._cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, func) -> SignatureInfo:
+        """
+        获取函数的参数解析结果
+        :param func: 目标函数
+        :return: SignatureInfo
+        """
+        if type(func) is MethodType:
+            target = func.__func__
+            bound = True
         else:
-            raise e
-    return re_dict
+            target = func
+            bound = False
+        if type(target) is not FunctionType:
+            self.misses += 1
+            return SignatureInfo(Signature.from_callable(func))
+        code = target.__code__
+        attr_dict = target.__dict__
+        refs = (target.__defaults__, target.__kwdefaults__, target.__annotations__, attr_dict.get('__signature__'), attr_dict.get('__wrapped__'))
+        key = (*[id(_) for _ in refs], bound)
+        code_id = id(code)
+        variants = self._cache.get(code_id)
+        if variants is not None:
+            info = variants[1].get(key)
+            if info is not None:
+                self.hits += 1
+                try:
+                    self._cache.move_to_end(code_id)
+                except KeyError:
+                    pass
+                return info
+        self.misses += 1
+        info = SignatureInfo(Signature.from_callable(func), refs)
+        if variants is None:
+            variants = (weakref.ref(code, lambda _: self._cache.pop(code_id, None)), {})
+            self._cache[code_id] = variants
+            while len(self._cache) > self.max_size:
+                try:
+                    self._cache.popitem(last=False)
+                except KeyError:
+                    break
+        elif len(variants[1]) >= self.max_variants:
+            try:
+                variants[1].pop(next(iter(variants[1])))
+            except (KeyError, RuntimeError, StopIteration):
+                pass
+        variants[1][key] = info
+        return info
+
+    def args_dict(self, func) -> Dict[str, Dict[str, Parameter]]:
+        """
+        获得函数的参数分类，无法解析的builtin函数会使用builtin_function_args_dict中的预设
+        :param func: 目标函数
+        :return: 共享的dict，请勿修改
+        """
+        try:
+            return self.get(func).args_dict
+        except Exception as e:
+            if getattr(func, '__name__', None) in builtin_function_args_dict:
+                return builtin_function_args_dict[func.__name__]
+            else:
+                raise e
+
+    def info(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': sum([len(_[1]) for _ in list(self._cache.values())]),
+        }
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+SIGNATURE_CACHE = SignatureCache()
+
+
+def get_args_dict_from_function(func) -> Dict[str, Dict[str, Parameter]]:
+    """
+    获得函数的参数分类，一共分成四类，返回一个4键值的dict
+    :param func: 目标函数
+    :return: key分别是arg、args、kwarg、kwargs的dict
+    """
+    return {i: dict(v) for i, v in SIGNATURE_CACHE.args_dict(func).items()}
 
 
 def get_parameter_kind_list_from_function(func) -> List[List[Parameter]]:
@@ -64,19 +174,7 @@ def get_parameter_kind_list_from_function(func) -> List[List[Parameter]]:
     :param func: 原函数
     :return: [[position only],[position or keyword],[var position],[keyword only],[var keyword]]
     """
-    re_value = [[], [], [], [], []]
-    for i, v in Signature.from_callable(func).parameters.items():
-        if v.kind == Parameter.VAR_KEYWORD:
-            re_value[4].append(v)
-        elif v.kind == Parameter.VAR_POSITIONAL:
-            re_value[2].append(v)
-        elif v.kind == Parameter.KEYWORD_ONLY:
-            re_value[3].append(v)
-        elif v.kind == Parameter.POSITIONAL_ONLY:
-            re_value[0].append(v)
-        else:
-            re_value[1].append(v)
-    return re_value
+    return [list(_) for _ in SIGNATURE_CACHE.get(func).kind_list]
 
 
 def analyse_args_kw_value_from_function(func, *args, **kwargs):
@@ -88,7 +186,7 @@ def analyse_args_kw_value_from_function(func, *args, **kwargs):
     :return:
     """
     re_value = {}
-    param_list = get_parameter_kind_list_from_function(func)
+    param_list = SIGNATURE_CACHE.get(func).kind_list
     position_list = param_list[0] + param_list[1]
     for arg_index, arg_param in enumerate(position_list):
         arg_name = arg_param.name
@@ -133,7 +231,7 @@ def analyse_args_value_from_function(func, *args, **kwargs):
         'arg': {},
         'kwarg': {},
     }
-    arg_dict = get_args_dict_from_function(func)
+    arg_dict = SIGNATURE_CACHE.args_dict(func)
     for index, name in enumerate(arg_dict['arg'].keys()):
         param = arg_dict['arg'][name]
         if index < len(args):
@@ -172,8 +270,8 @@ def combine_parameter_from_functions(ori_func, run_func) -> List[Parameter]:
     :return: 合成的参数列表
     """
     re_list = []
-    ori_dict = get_args_dict_from_function(ori_func)
-    run_dict = get_args_dict_from_function(run_func)
+    ori_dict = SIGNATURE_CACHE.args_dict(ori_func)
+    run_dict = SIGNATURE_CACHE.args_dict(run_func)
     for i, v in ori_dict['arg'].items():
         if v.default == Parameter.empty:
             re_list.append(v)
@@ -248,23 +346,14 @@ def insert_parameter_into_parameters(parameters: list, *new_parameters):
     :param new_parameters: 新的参数，以*args的方式传入即可
     :return: 无，传入的list已经被改变了
     """
-    if len(new_parameters) == 0:
-        return
-    if len(parameters) == 0:
-        parameters.append(new_parameters[0])
-        insert_parameter_into_parameters(parameters, *new_parameters[1:])
-    i = 0
-    last_priority = 0
-    new_parameter_priority = [get_parameter_priority(_) for _ in new_parameters]
-    while i < len(parameters):
-        v = parameters[i]
-        v_priority = get_parameter_priority(v)
-        if v_priority != last_priority and v_priority > 1:
-            for j, w in enumerate(new_parameter_priority):
-                if w < v_priority:
-                    parameters.insert(i, new_parameters[j])
-                    i += 1
-        i += 1
+    for new_parameter in new_parameters:
+        new_priority = get_parameter_priority(new_parameter)
+        for i, v in enumerate(parameters):
+            if get_parameter_priority(v) > new_priority:
+                parameters.insert(i, new_parameter)
+                break
+        else:
+            parameters.append(new_parameter)
 
 
 def get_parameter_priority(parameter):
@@ -288,52 +377,388 @@ def get_parameter_priority(parameter):
         return 10
 
 
+trampoline_lineno = inspect.currentframe().f_lineno + 2
+trampoline_source = (
+    'def wrapper({parameters}):\n'
+    '    return {func}({arguments})\n'
+)
+async_trampoline_lineno = inspect.currentframe().f_lineno + 2
+async_trampoline_source = (
+    'async def wrapper({parameters}):\n'
+    '    return await {func}({arguments})\n'
+)
+maybe_async_trampoline_lineno = inspect.currentframe().f_lineno + 2
+maybe_async_trampoline_source = (
+    'async def wrapper({parameters}):\n'
+    '    {value} = {func}({arguments})\n'
+    '    return (await {value}) if {isawaitable}({value}) else {value}\n'
+)
+async_generator_trampoline_lineno = inspect.currentframe().f_lineno + 2
+async_generator_trampoline_source = (
+    'async def wrapper({parameters}):\n'
+    '    {gen} = {func}({arguments})\n'
+    '    try:\n'
+    '        {value} = await {gen}.__anext__()\n'
+    '    except StopAsyncIteration:\n'
+    '        return\n'
+    '    while True:\n'
+    '        try:\n'
+    '            {send} = yield {value}\n'
+    '        except GeneratorExit:\n'
+    '            await {gen}.aclose()\n'
+    '            raise\n'
+    '        except BaseException as {error}:\n'
+    '            try:\n'
+    '                {value} = await {gen}.athrow({error})\n'
+    '            except StopAsyncIteration:\n'
+    '                return\n'
+    '        else:\n'
+    '            try:\n'
+    '                {value} = await ({gen}.__anext__() if {send} is None else {gen}.asend({send}))\n'
+    '            except StopAsyncIteration:\n'
+    '                return\n'
+)
+trampoline_source_dict = {
+    'sync': (trampoline_lineno, trampoline_source),
+    'async': (async_trampoline_lineno, async_trampoline_source),
+    'maybe_async': (maybe_async_trampoline_lineno, maybe_async_trampoline_source),
+    'async_generator': (async_generator_trampoline_lineno, async_generator_trampoline_source),
+}
+
+
+def get_trampoline_type(ori_func, run_func) -> str:
+    """
+    根据原函数和运行函数判定需要生成的跳板函数的类型，类型由运行函数决定：运行函数本身是async函数时，直接await，否则为普通函数
+    只有开启了WRAPS_CONFIG.async_passthrough时，普通的运行函数包装async原函数才会生成async的跳板函数，运行函数的返回值可以await时才会await
+    :param ori_func: 原函数
+    :param run_func: 实际要被运行的函数
+    :return: sync、async、maybe_async、async_generator
+    """
+    if inspect.isasyncgenfunction(run_func):
+        return 'async_generator'
+    elif inspect.iscoroutinefunction(run_func):
+        return 'async'
+    elif WRAPS_CONFIG.async_passthrough and ori_func is not None and inspect.isasyncgenfunction(ori_func):
+        return 'async_generator'
+    elif WRAPS_CONFIG.async_passthrough and ori_func is not None and inspect.iscoroutinefunction(ori_func):
+        return 'maybe_async'
+    else:
+        return 'sync'
+
+
+def get_unused_name(name: str, used_names) -> str:
+    """
+    获取一个不在used_names中的变量名
+    """
+    while name in used_names:
+        name += '_'
+    return name
+
+
+def get_trampoline_arguments_text(parameters, run_arg_list: dict, call_style: str = 'arg') -> str:
+    """
+    根据新函数的参数和运行函数的参数列表，生成调用运行函数时的参数文本
+    :param parameters: 新函数的parameters
+    :param run_arg_list: 实际要被运行的函数的参数列表
+    :param call_style: arg：按照参数类型传入；kw：全部以keyword的形式传入；dict：wraps_func专用，按照组别打包成dict传入
+    :return: 参数文本，例如 a, b, *args, c=c, **kwargs
+    """
+    local_names = [_.name for _ in parameters]
+    arguments = []
+    if call_style == 'dict':
+        for group_name, names in run_arg_list.items():
+            if group_name == '':
+                arguments += [f'{_}={_}' for _ in names]
+            else:
+                arguments.append(f'{group_name}={{' + ', '.join([f'{_!r}: {_}' for _ in names]) + '}')
+    elif call_style == 'kw':
+        arguments += [f'{_}={_}' for _ in run_arg_list['arg'] if _ in local_names]
+        if run_arg_list['args'] and run_arg_list['args'] in local_names:
+            arguments.append(f'{run_arg_list["args"]}={run_arg_list["args"]}')
+        arguments += [f'{_}={_}' for _ in run_arg_list['kwarg'] if _ in local_names]
+        if run_arg_list['kwargs'] and run_arg_list['kwargs'] in local_names:
+            arguments.append(f'**{run_arg_list["kwargs"]}')
+    elif call_style == 'arg':
+        arguments += [_ for _ in run_arg_list['arg'] if _ in local_names]
+        if run_arg_list['args'] and run_arg_list['args'] in local_names:
+            arguments.append(f'*{run_arg_list["args"]}')
+        arguments += [f'{_}={_}' for _ in run_arg_list['kwarg'] if _ in local_names]
+        if run_arg_list['kwargs'] and run_arg_list['kwargs'] in local_names:
+            arguments.append(f'**{run_arg_list["kwargs"]}')
+    else:
+        raise ValueError(f'call_style should be arg, kw or dict, but got {call_style}')
+    return ', '.join(arguments)
+
+
+TRAMPOLINE_CODE_MAX_SIZE = 1024
+TRAMPOLINE_CODE_DICT: OrderedDict = OrderedDict()
+
+
+def compile_trampoline_code(parameters, arguments_text: str, trampoline_type: str = 'sync', closure: bool = False) -> Tuple[CodeType, Dict[str, str]]:
+    """
+    编译跳板函数的code，函数名称固定为wrapper
+    :param parameters: 新函数的parameters
+    :param arguments_text: 调用运行函数时的参数文本
+    :param trampoline_type: 跳板函数的类型，详见get_trampoline_type
+    :param closure: 运行函数是否以闭包变量的形式传入。为False时运行函数需要放在globals里
+    :return: (code, {模板中的名称: 实际使用的变量名})
+    """
+    arg_names = []
+    kwarg_names = []
+    args_name = None
+    kwargs_name = None
+    for _v in parameters:
+        if _v.kind == Parameter.VAR_POSITIONAL:
+            args_name = _v.name
+        elif _v.kind == Parameter.VAR_KEYWORD:
+            kwargs_name = _v.name
+        elif _v.kind == Parameter.KEYWORD_ONLY:
+            kwarg_names.append(_v.name)
+        else:
+            arg_names.append(_v.name)
+    parameters_list = list(arg_names)
+    if args_name is not None:
+        parameters_list.append(f'*{args_name}')
+    elif kwarg_names:
+        parameters_list.append('*')
+    parameters_list += kwarg_names
+    if kwargs_name is not None:
+        parameters_list.append(f'**{kwargs_name}')
+    local_names = [_.name for _ in parameters]
+    name_dict = {_: get_unused_name(_, local_names) for _ in ('func', 'value', 'isawaitable', 'gen', 'send', 'error')}
+    lineno, source = trampoline_source_dict[trampoline_type]
+    source = source.format(
+        parameters=', '.join(parameters_list),
+        arguments=arguments_text,
+        **name_dict,
+    )
+    if closure:
+        source = '\n' * (lineno - 2) + f'def factory({name_dict["func"]}):\n' + textwrap.indent(source, '    ')
+        factory_code = [_ for _ in compile(source, __file__, 'exec').co_consts if isinstance(_, CodeType)][0]
+        wrapper_code = [_ for _ in factory_code.co_consts if isinstance(_, CodeType)][0]
+    else:
+        source = '\n' * (lineno - 1) + source
+        wrapper_code = [_ for _ in compile(source, __file__, 'exec').co_consts if isinstance(_, CodeType)][0]
+    return wrapper_code, name_dict
+
+
+def create_trampoline_code(parameters, arguments_text: str, func_name: str, trampoline_type: str = 'sync', closure: bool = False, func_qualname: str = None) -> Tuple[CodeType, Dict[str, str]]:
+    """
+    生成一个直线执行的跳板函数的code，函数体只有一句 return func(...)，不需要在运行时解析参数
+    生成的code的行号指向本文件中对应的trampoline_source的位置，traceback中可以直接看到跳板函数的内容
+    参数形态、参数文本和类型都相同的code只编译一次，保存在TRAMPOLINE_CODE_DICT中，之后只替换名称
+    :param parameters: 新函数的parameters
+    :param arguments_text: 调用运行函数时的参数文本
+    :param func_name: 新函数名称
+    :param trampoline_type: 跳板函数的类型，详见get_trampoline_type
+    :param closure: 运行函数是否以闭包变量的形式传入。为False时运行函数需要放在globals里
+    :param func_qualname: 新函数的__qualname__，python3.11以上会同时写入code，默认为func_name
+    :return: (code, {模板中的名称: 实际使用的变量名})
+    """
+    key = (tuple((_.name, _.kind) for _ in parameters), arguments_text, trampoline_type, closure)
+    code_info = TRAMPOLINE_CODE_DICT.get(key)
+    if code_info is None:
+        code_info = compile_trampoline_code(parameters, arguments_text, trampoline_type, closure)
+        TRAMPOLINE_CODE_DICT[key] = code_info
+        while len(TRAMPOLINE_CODE_DICT) > TRAMPOLINE_CODE_MAX_SIZE:
+            try:
+                TRAMPOLINE_CODE_DICT.popitem(last=False)
+            except KeyError:
+                break
+    else:
+        try:
+            TRAMPOLINE_CODE_DICT.move_to_end(key)
+        except KeyError:
+            pass
+    wrapper_code, name_dict = code_info
+    if sys.version_info >= (3, 11):
+        return wrapper_code.replace(co_name=func_name, co_qualname=func_qualname or func_name), name_dict
+    return wrapper_code.replace(co_name=func_name), name_dict
+
+
+COMPACT_CODE_DICT: Dict[tuple, Tuple[CodeType, Dict[str, str]]] = {}
+COMPACT_GLOBALS = {'__name__': __name__}
+
+
+def create_compact_trampoline_code(parameters, arguments_text: str, trampoline_type: str = 'sync') -> Tuple[CodeType, Dict[str, str]]:
+    """
+    紧凑模式下使用的跳板函数code，参数形态相同的函数共用同一个code
+    运行函数作为闭包变量传入，所有紧凑模式的跳板函数共用COMPACT_GLOBALS
+    :param parameters: 新函数的parameters
+    :param arguments_text: 调用运行函数时的参数文本
+    :param trampoline_type: 跳板函数的类型，详见get_trampoline_type
+    :return: (code, {模板中的名称: 实际使用的变量名})
+    """
+    key = (tuple((_.name, _.kind) for _ in parameters), arguments_text, trampoline_type)
+    code_info = COMPACT_CODE_DICT.get(key)
+    if code_info is None:
+        code_info = create_trampoline_code(parameters, arguments_text, 'wrapper', trampoline_type, closure=True)
+        COMPACT_GLOBALS.setdefault(code_info[1]['isawaitable'], inspect.isawaitable)
+        COMPACT_CODE_DICT[key] = code_info
+    return code_info
+
+
+def create_signature_from_function_parameters(func, parameters) -> Signature:
+    """
+    使用已经计算好的参数列表，为生成的函数创建signature，结果和inspect从code中解析出来的完全一致
+    生成的函数中，position only的参数会变成普通的位置参数，默认值和注释均以函数当前的值为准
+    :param func: 生成的函数
+    :param parameters: 生成函数时使用的parameters
+    :return: Signature，一般赋值给func.__signature__
+    """
+    annotations = func.__annotations__
+    defaults = func.__defaults__ or ()
+    kwdefaults = func.__kwdefaults__ or {}
+    arg_list = [_ for _ in parameters if _.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)]
+    args_list = [_ for _ in parameters if _.kind == Parameter.VAR_POSITIONAL]
+    kwarg_list = [_ for _ in parameters if _.kind == Parameter.KEYWORD_ONLY]
+    kwargs_list = [_ for _ in parameters if _.kind == Parameter.VAR_KEYWORD]
+    non_default_count = len(arg_list) - len(defaults)
+    re_list = []
+    for index, v in enumerate(arg_list):
+        default = Parameter.empty if index < non_default_count else defaults[index - non_default_count]
+        re_list.append(Parameter(v.name, Parameter.POSITIONAL_OR_KEYWORD, default=default, annotation=annotations.get(v.name, Parameter.empty)))
+    for v in args_list:
+        re_list.append(Parameter(v.name, Parameter.VAR_POSITIONAL, annotation=annotations.get(v.name, Parameter.empty)))
+    for v in kwarg_list:
+        re_list.append(Parameter(v.name, Parameter.KEYWORD_ONLY, default=kwdefaults.get(v.name, Parameter.empty), annotation=annotations.get(v.name, Parameter.empty)))
+    for v in kwargs_list:
+        re_list.append(Parameter(v.name, Parameter.VAR_KEYWORD, annotation=annotations.get(v.name, Parameter.empty)))
+    return Signature(re_list, return_annotation=annotations.get('return', Signature.empty), __validate_parameters__=False)
+
+
+class WrapsConfig:
+    """
+    wraps系列装饰器的全局设置
+    fusion：运行函数本身就是wraps生成的跳板函数时，是否直接调用它的运行函数，以减少栈的层数
+    compact：紧凑模式，用于装饰大量函数时节省内存。参数形态相同的跳板函数共用code和globals，相同的签名共用同一个Signature，
+             合并注释时如果只有一个非空注释则直接复用原字符串。代价是traceback中跳板函数的名称统一显示为wrapper
+    lazy：延迟装饰模式，装饰器只返回一个LazyFunction代理，第一次调用时才生成真实的跳板函数并替换掉自己，用于减少导入时间
+    async_passthrough：普通函数包装async函数时，是否也生成async的跳板函数，使装饰后的函数依然可以被识别为async函数。
+                       默认关闭，因为普通函数可能就是为了把async函数变成普通函数，例如在内部使用asyncio.run
+    """
+
+    def __init__(self):
+        self.fusion = True
+        self.compact = False
+        self.lazy = False
+        self.async_passthrough = False
+
+
+WRAPS_CONFIG = WrapsConfig()
+
+
+class TrampolineInfo:
+    """
+    记录在wraps生成的跳板函数的__movoid_trampoline__上，用于多层装饰时合并跳板函数
+    """
+    __slots__ = ('run_func', 'arguments_text', 'identity_text', 'trampoline_type')
+
+    def __init__(self, run_func, arguments_text: str, identity_text: str, trampoline_type: str):
+        self.run_func = run_func
+        self.arguments_text = arguments_text
+        self.identity_text = identity_text
+        self.trampoline_type = trampoline_type
+
+
+def get_compact_function_doc(*docs):
+    """
+    紧凑模式下合并注释：只有一个非空注释时直接复用这个字符串，不再复制出一个新的字符串
+    :param docs: 所有需要合并的注释
+    :return: 合并后的注释，全部为空时返回None
+    """
+    doc_list = [_ for _ in docs if _ and _.strip('\n')]
+    if len(doc_list) == 1:
+        return doc_list[0]
+    return '\n'.join([_.strip('\n') for _ in doc_list]) or None
+
+
+COMPACT_SIGNATURE_MAX_SIZE = 1024
+COMPACT_SIGNATURE_DICT: OrderedDict = OrderedDict()
+
+
+def get_compact_signature(signature: Signature) -> Signature:
+    """
+    紧凑模式下，相同的签名共用同一个Signature对象
+    默认值和注解按照id比较，只有是同一个对象时才会共用，避免True、1、1.0这样相等但不同的默认值被合并
+    最多保存COMPACT_SIGNATURE_MAX_SIZE个签名，超过时删除最久没有使用的
+    :param signature: 新生成的签名
+    :return: 可以共用的签名
+    """
+    key = (id(signature.return_annotation), *[(_.name, _.kind, id(_.default), id(_.annotation)) for _ in signature.parameters.values()])
+    compact = COMPACT_SIGNATURE_DICT.get(key)
+    if compact is not None:
+        try:
+            COMPACT_SIGNATURE_DICT.move_to_end(key)
+        except KeyError:
+            pass
+        return compact
+    COMPACT_SIGNATURE_DICT[key] = signature
+    while len(COMPACT_SIGNATURE_DICT) > COMPACT_SIGNATURE_MAX_SIZE:
+        try:
+            COMPACT_SIGNATURE_DICT.popitem(last=False)
+        except KeyError:
+            break
+    return signature
+
+
+def get_fused_trampoline(real_run_func, arguments_text: str, trampoline_type: str):
+    """
+    如果运行函数本身是一个跳板函数，且当前跳板函数是把自己的参数原样传给它的，那么可以直接调用它的运行函数
+    可以多层连续合并，只要每一层都是原样传递参数
+    :param real_run_func: 实际要被运行的函数
+    :param arguments_text: 调用运行函数时的参数文本
+    :param trampoline_type: 当前跳板函数的类型
+    :return: (实际要被运行的函数, 参数文本, 跳板函数的类型)
+    """
+    if WRAPS_CONFIG.fusion and type(real_run_func) is FunctionType:
+        run_info = real_run_func.__dict__.get('__movoid_trampoline__')
+        if isinstance(run_info, TrampolineInfo) and run_info.identity_text == arguments_text:
+            if run_info.trampoline_type != 'sync':
+                trampoline_type = run_info.trampoline_type
+            return run_info.run_func, run_info.arguments_text, trampoline_type
+    return real_run_func, arguments_text, trampoline_type
+
+
 def create_function_with_parameters_function_args(
         parameters,
         return_annotation,
         real_run_func,
         run_arg_list: dict,
-        wrapper,
-        func_name: str,
-        func_doc: str
+        wrapper=None,
+        func_name: str = 'wrapper',
+        func_doc: str = None,
+        call_style: str = 'arg',
+        ori_func=None,
 ):
     """
     可以按照既定的参数生成一个函数
+    生成的函数是一个按照参数签名专门生成的跳板函数，例如 return func(a, b, *args, c=c, **kwargs)
     :param parameters: 新函数的parameters
     :param return_annotation: 新函数的return_annotation
     :param real_run_func: 实际要被运行的函数
     :param run_arg_list: 实际要被运行的函数的参数列表
-    :param wrapper: wrapper函数
+    :param wrapper: 已经不再使用，生成的函数不再基于wrapper的code，只为兼容旧的调用方式而保留
     :param func_name: 新函数名称，一般为ori_func的名称
     :param func_doc: 新函数的注释，一般为函数的合并
+    :param call_style: 调用实际运行函数的方式，详见get_trampoline_arguments_text
+    :param ori_func: 原函数，原函数或运行函数是async函数时，会生成async的跳板函数。新函数会使用原函数的__module__和__qualname__，以便于pickle按照名称引用
     :return: 返回目标函数
     """
-    wrap_code = wrapper.__code__
-
-    mod_co_arg_count = len([_v for _v in parameters if _v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)])
-    mod_co_kwarg_count = len([_v for _v in parameters if _v.kind == Parameter.KEYWORD_ONLY])
-    mod_co_flags = wrap_code.co_flags
-    var_names = []
-    var_names_arg = None
-    var_names_kwarg = None
-    for _v in parameters:
-        if _v.kind == Parameter.VAR_POSITIONAL:
-            var_names_arg = _v.name
-        elif _v.kind == Parameter.VAR_KEYWORD:
-            var_names_kwarg = _v.name
-        else:
-            var_names.append(_v.name)
-    if var_names_arg is not None:
-        var_names.append(var_names_arg)
-        mod_co_flags = mod_co_flags | inspect.CO_VARARGS
-    if var_names_kwarg is not None:
-        var_names.append(var_names_kwarg)
-        mod_co_flags = mod_co_flags | inspect.CO_VARKEYWORDS
-    for _var_name in wrap_code.co_varnames:
-        if _var_name not in var_names:
-            var_names.append(_var_name)
-    mod_co_var_names = tuple(var_names)
-    mod_co_name = func_name
+    name_list = [_.name for _ in parameters]
+    if len(set(name_list)) != len(name_list):
+        duplicate_list = sorted({_ for _ in name_list if name_list.count(_) > 1})
+        raise TypeError(f'duplicate argument {duplicate_list} in function {func_name}: {name_list}')
+    arguments_text = get_trampoline_arguments_text(parameters, run_arg_list, call_style)
+    real_run_func = resolve_lazy_function(real_run_func)
+    trampoline_type = get_trampoline_type(ori_func, real_run_func)
+    real_run_func, arguments_text, trampoline_type = get_fused_trampoline(real_run_func, arguments_text, trampoline_type)
+    compact = WRAPS_CONFIG.compact
+    if compact:
+        final_code, name_dict = create_compact_trampoline_code(parameters, arguments_text, trampoline_type)
+    else:
+        func_qualname = func_name if ori_func is None else getattr(ori_func, '__qualname__', func_name)
+        final_code, name_dict = create_trampoline_code(parameters, arguments_text, func_name, trampoline_type, func_qualname=func_qualname)
     default_arg_values = []
     default_kwarg_values = {}
     for _v in parameters:
@@ -344,33 +769,201 @@ def create_function_with_parameters_function_args(
                 default_kwarg_values[_v.name] = _v.default
     default_arg_values = tuple(default_arg_values)
 
-    final_code = wrap_code.replace(
-        co_argcount=mod_co_arg_count,
-        co_kwonlyargcount=mod_co_kwarg_count,
-        co_nlocals=len(mod_co_var_names),
-        co_varnames=mod_co_var_names,
-        co_name=mod_co_name,
-        co_flags=mod_co_flags,
-    )
     func_annotations = {_.name: _.annotation for _ in parameters if _.annotation != Parameter.empty}
     func_annotations['return'] = return_annotation
 
-    modified_func = FunctionType(
-        final_code,
-        {
-            'func': real_run_func,
-            'func_arg': run_arg_list,
-            'locals': locals,
-            '__name__': __name__,
-        },
-        name=mod_co_name)
+    STACK.ignore_function(final_code)
+    if compact:
+        modified_func = FunctionType(final_code, COMPACT_GLOBALS, func_name, None, (CellType(real_run_func),))
+    else:
+        modified_func = FunctionType(
+            final_code,
+            {
+                name_dict['func']: real_run_func,
+                name_dict['isawaitable']: inspect.isawaitable,
+                '__name__': __name__,
+            },
+            name=func_name)
     modified_func.__doc__ = func_doc
+    if ori_func is not None:
+        modified_func.__module__ = getattr(ori_func, '__module__', __name__)
+        modified_func.__qualname__ = getattr(ori_func, '__qualname__', func_name)
     modified_func.__annotations__ = func_annotations
-    modified_func.__defaults__ = default_arg_values
-    modified_func.__kwdefaults__ = default_kwarg_values
+    if compact:
+        modified_func.__defaults__ = default_arg_values or None
+        modified_func.__kwdefaults__ = default_kwarg_values or None
+        modified_func.__signature__ = get_compact_signature(create_signature_from_function_parameters(modified_func, parameters))
+    else:
+        modified_func.__defaults__ = default_arg_values
+        modified_func.__kwdefaults__ = default_kwarg_values
+        modified_func.__signature__ = create_signature_from_function_parameters(modified_func, parameters)
+    identity_text = get_trampoline_arguments_text(parameters, get_args_name_from_parameters(parameters))
+    modified_func.__movoid_trampoline__ = TrampolineInfo(
+        run_func=real_run_func,
+        arguments_text=sys.intern(arguments_text),
+        identity_text=sys.intern(identity_text),
+        trampoline_type=trampoline_type,
+    )
     return modified_func
 
 
+def is_async_function(func) -> bool:
+    """
+    判断函数是否是协程函数或异步生成器函数
+    """
+    return inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func)
+
+
+LAZY_LOAD_LOCK = threading.RLock()
+
+
+class LazyFunction:
+    """
+    延迟装饰模式下，装饰器返回的轻量代理
+    只记录生成真实函数所需的信息，第一次被调用（或作为方法被取出）时才真正生成跳板函数，然后用真实函数替换掉自己在类或模块中的位置
+    多个线程同时第一次调用时，只有一个线程会生成真实函数，其他线程等待后直接使用
+    """
+
+    def __init__(self, build, run_func, meta_func):
+        """
+        :param build: 生成真实函数的函数，传入run_func
+        :param run_func: 装饰器接收到的函数
+        :param meta_func: 用于提供名称等信息的函数
+        """
+        self.__movoid_build__ = build
+        self.__movoid_run_func__ = run_func
+        self.__movoid_func__ = None
+        self.__movoid_owner__ = None
+        self.__name__ = getattr(meta_func, '__name__', None)
+        self.__qualname__ = getattr(meta_func, '__qualname__', self.__name__)
+        self.__module__ = getattr(meta_func, '__module__', None)
+
+    def __movoid_load__(self):
+        """
+        生成真实的函数，并尝试替换掉类或模块中的自己
+        :return: 真实的函数
+        """
+        func = self.__movoid_func__
+        if func is None:
+            with LAZY_LOAD_LOCK:
+                func = self.__movoid_func__
+                if func is None:
+                    func = self.__movoid_build__(self.__movoid_run_func__)
+                    self.__movoid_func__ = func
+                    self.__movoid_build__ = None
+                    self.__movoid_run_func__ = None
+                    self.__movoid_replace__(func)
+        return func
+
+    def __movoid_replace__(self, func):
+        """
+        如果自己还在所属的类或模块中，那么替换为真实的函数。局部函数无法定位，只能继续通过代理调用
+        :param func: 真实的函数
+        """
+        if self.__movoid_owner__ is not None:
+            owner, name = self.__movoid_owner__
+        else:
+            if self.__module__ not in sys.modules or '<locals>' in self.__qualname__:
+                return
+            owner = sys.modules[self.__module__]
+            name_list = self.__qualname__.split('.')
+            for owner_name in name_list[:-1]:
+                owner = getattr(owner, owner_name, None)
+            name = name_list[-1]
+        if owner is not None and getattr(owner, '__dict__', {}).get(name) is self:
+            try:
+                setattr(owner, name, func)
+            except (AttributeError, TypeError):
+                pass
+
+    def __set_name__(self, owner, name):
+        self.__movoid_owner__ = (owner, name)
+
+    def __get__(self, instance, owner=None):
+        return self.__movoid_load__().__get__(instance, owner)
+
+    def __call__(self, *args, **kwargs):
+        return self.__movoid_load__()(*args, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('__movoid_'):
+            raise AttributeError(item)
+        return getattr(self.__movoid_load__(), item)
+
+    def __dir__(self):
+        return dir(self.__movoid_load__())
+
+    def __reduce__(self):
+        return resolve_lazy_function, (self.__movoid_load__(),)
+
+    def __repr__(self):
+        if self.__movoid_func__ is None:
+            return f'<lazy function {self.__qualname__}>'
+        return repr(self.__movoid_func__)
+
+    @property
+    def __doc__(self):
+        return self.__movoid_load__().__doc__
+
+    @property
+    def __signature__(self):
+        return self.__movoid_load__().__signature__
+
+
+def resolve_lazy_function(func):
+    """
+    如果是延迟装饰的代理，那么生成并返回真实的函数，否则原样返回
+    :param func: 任意函数
+    :return: 真实的函数
+    """
+    if isinstance(func, LazyFunction):
+        return func.__movoid_load__()
+    return func
+
+
+def resolve_lazy_cells(func):
+    """
+    把函数闭包中的LazyFunction替换为真实的函数
+    多层装饰时，内层装饰器返回的代理会被外层的wrapper以闭包变量的形式保存，它不在类或模块中，无法替换掉自己，
+    所以在生成外层函数时直接修改闭包，之后的调用不再经过代理，多层跳板函数也可以正常合并
+    :param func: 任意函数
+    """
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            value = cell.cell_contents
+        except ValueError:
+            continue
+        if isinstance(value, LazyFunction):
+            cell.cell_contents = value.__movoid_load__()
+
+
+def lazy_decorator(build, meta_func=None):
+    """
+    把wraps系列的生成函数包装为装饰器。开启WRAPS_CONFIG.lazy时，返回LazyFunction，第一次调用时才生成真实函数
+    异步函数需要保持iscoroutinefunction等判断的正确性，所以不会延迟
+    生成真实函数之前，被装饰的函数和build闭包中的内层代理（原函数）会先被替换为真实的函数
+    :param build: 生成真实函数的函数，传入被装饰的函数
+    :param meta_func: 提供名称等信息的函数，默认为被装饰的函数
+    :return: 装饰器
+    """
+    raw_build = build
+    if DECORATION_PROFILER.enabled:
+        build = DECORATION_PROFILER.instrument(build, meta_func)
+
+    def load(run_func):
+        resolve_lazy_cells(run_func)
+        resolve_lazy_cells(raw_build)
+        return build(run_func)
+
+    def dec(run_func):
+        info_func = run_func if meta_func is None else meta_func
+        if WRAPS_CONFIG.lazy and not is_async_function(run_func) and not is_async_function(info_func):
+            return LazyFunction(load, run_func, info_func)
+        return load(run_func)
+
+    return dec
+
+
 def wraps(ori_func):
     """
     装饰器专用，保证被装饰器装饰后的函数，保证名称、参数列表等信息不会因为装饰和发生巨大异变，是一个比function tool的wraps更好的装饰器专用装饰器
@@ -378,23 +971,7 @@ def wraps(ori_func):
     :return:
     """
 
-    def dec(run_func):
-        def wrapper():
-            __local = locals()
-            __func_args = []
-            __func_kwargs = {}
-            for __i in func_arg['arg']:  # noqa
-                if __i in __local:
-                    __func_args += [__local[__i]]
-            if func_arg['args'] and func_arg['args'] in __local:  # noqa
-                __func_args += __local[func_arg['args']]  # noqa
-            for __i in func_arg['kwarg']:  # noqa
-                __func_kwargs[__i] = __local[__i]  # noqa
-            if func_arg['kwargs'] and func_arg['kwargs'] in __local:  # noqa
-                __func_kwargs.update(__local[func_arg['kwargs']])  # noqa
-            __re_value = func(*__func_args, **__func_kwargs)  # noqa
-            return __re_value
-
+    def build(run_func):
         parameters = combine_parameter_from_functions(ori_func, run_func)
         func_arg_list = get_args_name_from_parameters(parameters)
         ori_code: CodeType = ori_func.__code__
@@ -402,21 +979,24 @@ def wraps(ori_func):
         annotations.update(run_func.__annotations__)
         annotations.update(ori_func.__annotations__)
 
-        ori_doc = '' if ori_func.__doc__ is None else ori_func.__doc__.strip('\n')
-        run_doc = '' if run_func.__doc__ is None else run_func.__doc__.strip('\n')
-        all_doc = ori_doc + '\n' + run_doc
-        all_doc.strip('\n')
-        if all_doc == '':
-            all_doc = None
+        if WRAPS_CONFIG.compact:
+            all_doc = get_compact_function_doc(ori_func.__doc__, run_func.__doc__)
+        else:
+            ori_doc = '' if ori_func.__doc__ is None else ori_func.__doc__.strip('\n')
+            run_doc = '' if run_func.__doc__ is None else run_func.__doc__.strip('\n')
+            all_doc = ori_doc + '\n' + run_doc
+            all_doc.strip('\n')
+            if all_doc == '':
+                all_doc = None
 
         new_function = create_function_with_parameters_function_args(
             parameters=parameters,
-            return_annotation=inspect.signature(ori_func).return_annotation,
+            return_annotation=SIGNATURE_CACHE.get(ori_func).signature.return_annotation,
             real_run_func=run_func,
             run_arg_list=func_arg_list,
-            wrapper=wrapper,
             func_name=ori_code.co_name,
-            func_doc=all_doc
+            func_doc=all_doc,
+            ori_func=ori_func,
         )
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
@@ -424,7 +1004,7 @@ def wraps(ori_func):
                 setattr(new_function, attr_name, attr_value)
         return new_function
 
-    return dec
+    return lazy_decorator(build, ori_func)
 
 
 def wraps_kw(ori_func):
@@ -434,22 +1014,7 @@ def wraps_kw(ori_func):
     :return:
     """
 
-    def dec(run_func):
-        def wrapper():
-            __local = locals()
-            __func_kwargs = {}
-            for __i in func_arg['arg']:  # noqa
-                if __i in __local:
-                    __func_kwargs[__i] = [__local[__i]]
-            if func_arg['args'] and func_arg['args'] in __local:  # noqa
-                __func_kwargs[func_arg['args']] = __local[func_arg['args']]  # noqa
-            for __i in func_arg['kwarg']:  # noqa
-                __func_kwargs[__i] = __local[__i]  # noqa
-            if func_arg['kwargs'] and func_arg['kwargs'] in __local:  # noqa
-                __func_kwargs.update(__local[func_arg['kwargs']])  # noqa
-            __re_value = func(**__func_kwargs)  # noqa
-            return __re_value
-
+    def build(run_func):
         parameters = combine_parameter_from_functions(ori_func, run_func)
         func_arg_list = get_args_name_from_parameters(parameters)
         ori_code: CodeType = ori_func.__code__
@@ -457,21 +1022,25 @@ def wraps_kw(ori_func):
         annotations.update(run_func.__annotations__)
         annotations.update(ori_func.__annotations__)
 
-        ori_doc = '' if ori_func.__doc__ is None else ori_func.__doc__.strip('\n')
-        run_doc = '' if run_func.__doc__ is None else run_func.__doc__.strip('\n')
-        all_doc = ori_doc + '\n' + run_doc
-        all_doc.strip('\n')
-        if all_doc == '':
-            all_doc = None
+        if WRAPS_CONFIG.compact:
+            all_doc = get_compact_function_doc(ori_func.__doc__, run_func.__doc__)
+        else:
+            ori_doc = '' if ori_func.__doc__ is None else ori_func.__doc__.strip('\n')
+            run_doc = '' if run_func.__doc__ is None else run_func.__doc__.strip('\n')
+            all_doc = ori_doc + '\n' + run_doc
+            all_doc.strip('\n')
+            if all_doc == '':
+                all_doc = None
 
         new_function = create_function_with_parameters_function_args(
             parameters=parameters,
-            return_annotation=inspect.signature(ori_func).return_annotation,
+            return_annotation=SIGNATURE_CACHE.get(ori_func).signature.return_annotation,
             real_run_func=run_func,
             run_arg_list=func_arg_list,
-            wrapper=wrapper,
             func_name=ori_code.co_name,
-            func_doc=all_doc
+            func_doc=all_doc,
+            call_style='kw',
+            ori_func=ori_func,
         )
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
@@ -479,7 +1048,7 @@ def wraps_kw(ori_func):
                 setattr(new_function, attr_name, attr_value)
         return new_function
 
-    return dec
+    return lazy_decorator(build, ori_func)
 
 
 def wraps_func(ori_func, *args):
@@ -491,21 +1060,7 @@ def wraps_func(ori_func, *args):
     :return:
     """
 
-    def dec(run_func):
-        def wrapper():
-            __local = locals()
-            __func_kwargs = {}
-            for __i, __v in func_arg.items():  # noqa
-                if __i == '':
-                    for __v2 in __v:
-                        __func_kwargs[__v2] = __local[__v2]
-                else:
-                    __func_kwargs[__i] = {}
-                    for __v2 in __v:
-                        __func_kwargs[__i][__v2] = __local[__v2]
-            __re_value = func(**__func_kwargs)  # noqa
-            return __re_value
-
+    def build(run_func):
         func_arg_dict = {
             '': []
         }
@@ -518,8 +1073,8 @@ def wraps_func(ori_func, *args):
         docs = [ori_func.__doc__, run_func.__doc__]
         annotations = {}
 
-        run_kw_parameter = [i for i, v in Signature.from_callable(run_func).parameters.items() if v.default == Parameter.empty and 'kw' in i]
-        for i, v in Signature.from_callable(run_func).parameters.items():
+        run_kw_parameter = [i for i, v in SIGNATURE_CACHE.get(run_func).signature.parameters.items() if v.default == Parameter.empty and 'kw' in i]
+        for i, v in SIGNATURE_CACHE.get(run_func).signature.parameters.items():
             if i not in run_kw_parameter:
                 func_arg_dict[''].append(i)
                 if v.default == Parameter.empty:
@@ -533,7 +1088,7 @@ def wraps_func(ori_func, *args):
             args_kw_parameter = run_kw_parameter[1:]
             kwargs_name = run_kw_parameter[0]
             func_arg_dict[kwargs_name] = []
-            for i, v in Signature.from_callable(ori_func).parameters.items():
+            for i, v in SIGNATURE_CACHE.get(ori_func).signature.parameters.items():
                 func_arg_dict[kwargs_name].append(i)
                 if v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
                     if v.default is Parameter.empty:
@@ -550,7 +1105,7 @@ def wraps_func(ori_func, *args):
             func_arg_dict[kwargs_name] = []
             docs.append(function.__doc__)
             annotations.update(function.__annotations__)
-            for i, v in Signature.from_callable(function).parameters.items():
+            for i, v in SIGNATURE_CACHE.get(function).signature.parameters.items():
                 func_arg_dict[kwargs_name].append(i)
                 if v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
                     if v.default is Parameter.empty:
@@ -567,54 +1122,26 @@ def wraps_func(ori_func, *args):
         for i, v in parameter_dict['kwarg'].items():
             parameters.append(v)
         annotations.update(run_func.__annotations__)
-        wrap_code = wrapper.__code__
         ori_code: CodeType = ori_func.__code__
-        mod_co_arg_count = len([_v for _v in parameters if _v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)])
-        mod_co_kwarg_count = len([_v for _v in parameters if _v.kind == Parameter.KEYWORD_ONLY])
-        mod_co_flags = wrap_code.co_flags
-        var_names = [_v.name for _v in parameters]
-        mod_co_flags = mod_co_flags | inspect.CO_VARARGS - inspect.CO_VARARGS
-        mod_co_flags = mod_co_flags | inspect.CO_VARKEYWORDS - inspect.CO_VARKEYWORDS
-        for _var_name in wrap_code.co_varnames:
-            if _var_name not in var_names:
-                var_names.append(_var_name)
-        mod_co_var_names = tuple(var_names)
-        mod_co_name = ori_code.co_name
-        default_arg_values = []
-        default_kwarg_values = {}
-        for _v in parameters:
-            if _v.default != Parameter.empty:
-                if _v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
-                    default_arg_values.append(_v.default)
-                elif _v.kind == Parameter.KEYWORD_ONLY:
-                    default_kwarg_values[_v.name] = _v.default
-        default_arg_values = tuple(default_arg_values)
-
-        final_code = wrap_code.replace(
-            co_argcount=mod_co_arg_count,
-            co_kwonlyargcount=mod_co_kwarg_count,
-            co_nlocals=len(mod_co_var_names),
-            co_varnames=mod_co_var_names,
-            co_name=mod_co_name,
-            co_flags=mod_co_flags,
-        )
-
-        modified_func = FunctionType(
-            final_code,
-            {'func': run_func, 'func_arg': func_arg_dict, 'locals': locals, '__name__': __name__, },
-            name=mod_co_name
+        modified_func = create_function_with_parameters_function_args(
+            parameters=parameters,
+            return_annotation=Signature.empty,
+            real_run_func=run_func,
+            run_arg_list=func_arg_dict,
+            func_name=ori_code.co_name,
+            func_doc=get_compact_function_doc(*docs) if WRAPS_CONFIG.compact else '\n'.join([_.strip('\n') for _ in docs if _]),
+            call_style='dict',
+            ori_func=ori_func,
         )
-        modified_func.__doc__ = '\n'.join([_.strip('\n') for _ in docs if _])
         modified_func.__annotations__ = annotations
-        modified_func.__defaults__ = default_arg_values
-        modified_func.__kwdefaults__ = default_kwarg_values
+        modified_func.__signature__ = create_signature_from_function_parameters(modified_func, parameters)
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
                 attr_value = getattr(ori_func, attr_name)
                 setattr(modified_func, attr_name, attr_value)
         return modified_func
 
-    return dec
+    return lazy_decorator(build, ori_func)
 
 
 def reset_function_default_value(ori_func):
@@ -635,15 +1162,16 @@ def test2(a=2):
     :param ori_func: 目标函数，也就是需要被copy的函数
     """
 
-    def dec(run_func):
+    def build(run_func):
         @wraps_func(run_func, ori_func)
         def wrapper(ori_kwargs):
             return ori_func(**ori_kwargs)
 
-        run_parameter = {i: v for i, v in Signature.from_callable(run_func).parameters.items()}
+        wrapper = resolve_lazy_function(wrapper)
+        run_parameter = {i: v for i, v in SIGNATURE_CACHE.get(run_func).signature.parameters.items()}
         default_arg_values = []
         default_kwarg_values = {}
-        for i, v in Signature.from_callable(ori_func).parameters.items():
+        for i, v in SIGNATURE_CACHE.get(ori_func).signature.parameters.items():
             if v.default != Parameter.empty:
                 if v.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
                     if i in run_parameter and run_parameter[i].default != Parameter.empty:
@@ -658,13 +1186,14 @@ def test2(a=2):
 
         wrapper.__defaults__ = tuple(default_arg_values)
         wrapper.__kwdefaults__ = default_kwarg_values
+        wrapper.__signature__ = create_signature_from_function_parameters(wrapper, list(wrapper.__signature__.parameters.values()))
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
                 attr_value = getattr(ori_func, attr_name)
                 setattr(wrapper, attr_name, attr_value)
         return wrapper
 
-    return dec
+    return lazy_decorator(build)
 
 
 def wraps_ori(ori_func):
@@ -673,35 +1202,19 @@ def wraps_ori(ori_func):
     :param ori_func:
     """
 
-    def dec(run_func):
-        def wrapper():
-            __local = locals()
-            __func_args = []
-            __func_kwargs = {}
-            for __i in func_arg['arg']:  # noqa
-                if __i in __local:
-                    __func_args += [__local[__i]]
-            if func_arg['args'] and func_arg['args'] in __local:  # noqa
-                __func_args += __local[func_arg['args']]  # noqa
-            for __i in func_arg['kwarg']:  # noqa
-                __func_kwargs[__i] = __local[__i]  # noqa
-            if func_arg['kwargs'] and func_arg['kwargs'] in __local:  # noqa
-                __func_kwargs.update(__local[func_arg['kwargs']])  # noqa
-            __re_value = func(*__func_args, **__func_kwargs)  # noqa
-            return __re_value
-
+    def build(run_func):
         parameters = combine_parameter_from_functions(ori_func, run_func)
-        func_arg_list = get_args_name_from_parameters(list(Signature.from_callable(ori_func).parameters.values()))
+        func_arg_list = get_args_name_from_parameters(list(SIGNATURE_CACHE.get(ori_func).parameters))
         ori_code: CodeType = ori_func.__code__
 
         new_function = create_function_with_parameters_function_args(
             parameters=parameters,
-            return_annotation=inspect.signature(ori_func).return_annotation,
+            return_annotation=SIGNATURE_CACHE.get(ori_func).signature.return_annotation,
             real_run_func=ori_func,
             run_arg_list=func_arg_list,
-            wrapper=wrapper,
             func_name=ori_code.co_name,
-            func_doc=ori_func.__doc__
+            func_doc=ori_func.__doc__,
+            ori_func=ori_func,
         )
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
@@ -709,7 +1222,7 @@ def wraps_ori(ori_func):
                 setattr(new_function, attr_name, attr_value)
         return new_function
 
-    return dec
+    return lazy_decorator(build, ori_func)
 
 
 def wraps_add_one(name, default=Parameter.empty, kind=Parameter.POSITIONAL_OR_KEYWORD, annotation=None):
@@ -721,24 +1234,8 @@ def wraps_add_one(name, default=Parameter.empty, kind=Parameter.POSITIONAL_OR_KE
     :param annotation: 参数的注释，默认为空
     """
 
-    def dec(ori_func):
-        def wrapper():
-            __local = locals()
-            __func_args = []
-            __func_kwargs = {}
-            for __i in func_arg['arg']:  # noqa
-                if __i in __local:
-                    __func_args += [__local[__i]]
-            if func_arg['args'] and func_arg['args'] in __local:  # noqa
-                __func_args += __local[func_arg['args']]  # noqa
-            for __i in func_arg['kwarg']:  # noqa
-                __func_kwargs[__i] = __local[__i]  # noqa
-            if func_arg['kwargs'] and func_arg['kwargs'] in __local:  # noqa
-                __func_kwargs.update(__local[func_arg['kwargs']])  # noqa
-            __re_value = func(*__func_args, **__func_kwargs)  # noqa
-            return __re_value
-
-        parameters = list(Signature.from_callable(ori_func).parameters.values())
+    def build(ori_func):
+        parameters = list(SIGNATURE_CACHE.get(ori_func).parameters)
         new_parameter = analyse_additional_parameter(name=name, default=default, kind=kind, annotation=annotation)
         insert_parameter_into_parameters(parameters, new_parameter)
         func_arg_list = get_args_name_from_parameters(parameters)
@@ -746,12 +1243,12 @@ def wraps_add_one(name, default=Parameter.empty, kind=Parameter.POSITIONAL_OR_KE
 
         new_function = create_function_with_parameters_function_args(
             parameters=parameters,
-            return_annotation=inspect.signature(ori_func).return_annotation,
+            return_annotation=SIGNATURE_CACHE.get(ori_func).signature.return_annotation,
             real_run_func=ori_func,
             run_arg_list=func_arg_list,
-            wrapper=wrapper,
             func_name=ori_code.co_name,
-            func_doc=ori_func.__doc__
+            func_doc=ori_func.__doc__,
+            ori_func=ori_func,
         )
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
@@ -759,7 +1256,7 @@ def wraps_add_one(name, default=Parameter.empty, kind=Parameter.POSITIONAL_OR_KE
                 setattr(new_function, attr_name, attr_value)
         return new_function
 
-    return dec
+    return lazy_decorator(build)
 
 
 def wraps_add_multi(*parameters_info):
@@ -768,37 +1265,21 @@ def wraps_add_multi(*parameters_info):
     :param parameters_info: 每个参数都必须是一个列表，列表长度为1~4，分别对应name（名称）、default（默认值，默认没有默认值）、kind（参数类型，默认POSITIONAL_OR_KEYWORD）、annotation（注释，默认为空）
     """
 
-    def dec(ori_func):
-        def wrapper():
-            __local = locals()
-            __func_args = []
-            __func_kwargs = {}
-            for __i in func_arg['arg']:  # noqa
-                if __i in __local:
-                    __func_args += [__local[__i]]
-            if func_arg['args'] and func_arg['args'] in __local:  # noqa
-                __func_args += __local[func_arg['args']]  # noqa
-            for __i in func_arg['kwarg']:  # noqa
-                __func_kwargs[__i] = __local[__i]  # noqa
-            if func_arg['kwargs'] and func_arg['kwargs'] in __local:  # noqa
-                __func_kwargs.update(__local[func_arg['kwargs']])  # noqa
-            __re_value = func(*__func_args, **__func_kwargs)  # noqa
-            return __re_value
-
-        parameters = list(Signature.from_callable(ori_func).parameters.values())
+    def build(ori_func):
+        parameters = list(SIGNATURE_CACHE.get(ori_func).parameters)
         new_parameters = [analyse_additional_parameter(_) for _ in parameters_info]
         insert_parameter_into_parameters(parameters, *new_parameters)
-        func_arg_list = get_args_name_from_parameters(list(Signature.from_callable(ori_func).parameters.values()))
+        func_arg_list = get_args_name_from_parameters(list(SIGNATURE_CACHE.get(ori_func).parameters))
         ori_code: CodeType = ori_func.__code__
 
         new_function = create_function_with_parameters_function_args(
             parameters=parameters,
-            return_annotation=inspect.signature(ori_func).return_annotation,
+            return_annotation=SIGNATURE_CACHE.get(ori_func).signature.return_annotation,
             real_run_func=ori_func,
             run_arg_list=func_arg_list,
-            wrapper=wrapper,
             func_name=ori_code.co_name,
             func_doc=ori_func.__doc__,
+            ori_func=ori_func,
         )
         for attr_name in dir(ori_func):
             if not (attr_name.startswith('__') and attr_name.endswith('__')):
@@ -806,13 +1287,254 @@ def wraps_add_multi(*parameters_info):
                 setattr(new_function, attr_name, attr_value)
         return new_function
 
-    return dec
+    return lazy_decorator(build)
+
+
+class BindingPlan:
+    """
+    adapt_call的参数绑定方案，对同一种输入形态只解析一次
+    binder是一个生成的函数，输入(ori_args, ori_kwargs, other_args, other_kwargs)，只通过下标和切片返回(args, kwargs)
+    binder为None时，说明ori_func无法解析，参数会原样传入
+    self_source为'ori'或'other'时，需要补充对应函数的__self__，方案本身不保存self
+    refs保存生成方案时函数的默认值等对象，保证缓存key中的id不会被复用
+    """
+    __slots__ = ('binder', 'self_source', 'injected_binder', 'refs')
+
+    def __init__(self, binder=None, self_source=None, injected_binder=None, refs=()):
+        self.binder = binder
+        self.self_source = self_source
+        self.injected_binder = injected_binder
+        self.refs = refs
+
+    def bind(self, ori_args: tuple, ori_kwargs: dict, other_args: tuple, other_kwargs: dict, ori_func=None, other_func=None):
+        """
+        按照方案绑定参数
+        :return: (args, kwargs)，可以直接传入ori_func
+        """
+        binder = self.binder
+        if self.self_source is not None:
+            self_obj = (ori_func if self.self_source == 'ori' else other_func).__self__
+            if len(ori_args) == 0 or ori_args[0] != self_obj:
+                ori_args = (self_obj,) + ori_args
+                binder = self.injected_binder
+        if binder is None:
+            return ori_args, ori_kwargs
+        else:
+            return binder(ori_args, ori_kwargs, other_args, other_kwargs)
+
+
+def get_binding_identity(func) -> Tuple[tuple, tuple]:
+    """
+    计算函数在BindingPlanCache的key中使用的部分
+    绑定方法只使用其__func__，不会因为缓存而保留self；默认值等影响绑定方案的对象以id的形式加入key
+    :param func: 目标函数
+    :return: (key中使用的部分, 需要由方案保留的对象)
+    """
+    if func is None:
+        return (None,), ()
+    if type(func) is MethodType:
+        target = func.__func__
+        bound = True
+    else:
+        target = func
+        bound = False
+    if type(target) is not FunctionType:
+        return (func,), ()
+    defaults = target.__defaults__
+    kwdefaults = target.__kwdefaults__
+    attr_dict = target.__dict__
+    if attr_dict:
+        signature = attr_dict.get('__signature__')
+        wrapped = attr_dict.get('__wrapped__')
+    else:
+        signature = wrapped = None
+    return (target, bound, id(defaults), id(kwdefaults), id(signature), id(wrapped)), (defaults, kwdefaults, signature, wrapped)
+
+
+def get_other_source_from_function(other_func, other_arg_count: int, other_kwarg_names: tuple, consts: list) -> Dict[str, str]:
+    """
+    按照analyse_args_value_from_function的规则，计算other参数中每个参数名称对应的取值文本
+    :param other_func: 其他来源的function
+    :param other_arg_count: 补充args的数量
+    :param other_kwarg_names: 补充kwargs的key
+    :param consts: 常量列表，默认值会被添加到这里，并以c[index]的形式取值
+    :return: {参数名: 取值文本}，取值文本中oa为补充args，ok为补充kwargs，c为常量
+    """
+    re_dict = {}
+    arg_dict = SIGNATURE_CACHE.args_dict(other_func)
+    for index, (name, param) in enumerate(arg_dict['arg'].items()):
+        if index < other_arg_count:
+            re_dict[name] = f'oa[{index}]'
+        elif param.default != Parameter.empty:
+            consts.append(param.default)
+            re_dict[name] = f'c[{len(consts) - 1}]'
+        else:
+            raise TypeError(f'function {other_func.__name__} needs positional argument "{name}" which is index of {index}')
+    for name in arg_dict['args']:
+        re_dict[name] = f'list(oa[{len(arg_dict["arg"])}:])'
+    for name, param in arg_dict['kwarg'].items():
+        if name in other_kwarg_names:
+            re_dict[name] = f'ok[{name!r}]'
+        elif param.default != Parameter.empty:
+            consts.append(param.default)
+            re_dict[name] = f'c[{len(consts) - 1}]'
+        else:
+            raise TypeError(f'function {other_func.__name__} needs keyword argument "{name}"')
+    if arg_dict['kwargs']:
+        for name in other_kwarg_names:
+            if name not in arg_dict['kwarg'] and name not in arg_dict['arg']:
+                re_dict[name] = f'ok[{name!r}]'
+    return re_dict
+
+
+def create_binder(ori_arg_dict, arg_count: int, kwarg_names: tuple, other_source: dict, force: bool, consts: list):
+    """
+    按照adapt_call的规则，生成一个只使用下标和切片的参数绑定函数
+    :param ori_arg_dict: ori_func的参数分类
+    :param arg_count: 基础args的数量
+    :param kwarg_names: 基础kwargs的key
+    :param other_source: get_other_source_from_function的结果
+    :param force: 即使存在默认值，也会从other参数中选择并填充
+    :param consts: 常量列表，会在这个列表的基础上继续添加默认值
+    :return: binder函数，输入(a, k, oa, ok)，返回(args, kwargs)
+    """
+    consts = list(consts)
+    args_text = []
+    kwargs_text = []
+    used_kwarg_key = []
+    for now_index, (name, parameter) in enumerate(ori_arg_dict['arg'].items()):
+        if arg_count > now_index:
+            args_text.append(f'a[{now_index}]')
+        elif name in kwarg_names:
+            args_text.append(f'k[{name!r}]')
+            used_kwarg_key.append(name)
+        elif force or parameter.default is Signature.empty:
+            if name in other_source:
+                args_text.append(other_source[name])
+        else:
+            consts.append(parameter.default)
+            args_text.append(f'c[{len(consts) - 1}]')
+    if ori_arg_dict['args']:
+        args_text.append(f'*a[{len(ori_arg_dict["arg"])}:]')
+    for name, parameter in ori_arg_dict['kwarg'].items():
+        if name in used_kwarg_key:
+            continue
+        elif name in kwarg_names:
+            kwargs_text.append(f'{name!r}: k[{name!r}]')
+            used_kwarg_key.append(name)
+        elif force or parameter.default is Signature.empty:
+            if name in other_source:
+                kwargs_text.append(f'{name!r}: {other_source[name]}')
+        else:
+            consts.append(parameter.default)
+            kwargs_text.append(f'{name!r}: c[{len(consts) - 1}]')
+    if ori_arg_dict['kwargs']:
+        for name in kwarg_names:
+            if name not in used_kwarg_key:
+                kwargs_text.append(f'{name!r}: k[{name!r}]')
+    args_text = ''.join([_ + ', ' for _ in args_text])
+    kwargs_text = ', '.join(kwargs_text)
+    return eval(f'lambda a, k, oa, ok: (({args_text}), {{{kwargs_text}}})', {'c': tuple(consts)})
+
+
+def create_binding_plan(ori_func, arg_count: int, kwarg_names: tuple, other_func=None, other_arg_count: int = 0, other_kwarg_names: tuple = (), force=False) -> BindingPlan:
+    """
+    按照adapt_call的规则，为一种输入形态生成参数绑定方案
+    :param ori_func: 原始的function
+    :param arg_count: 基础args的数量
+    :param kwarg_names: 基础kwargs的key
+    :param other_func: 其他来源的function
+    :param other_arg_count: 补充args的数量
+    :param other_kwarg_names: 补充kwargs的key
+    :param force: 即使存在默认值，也会从other参数中选择并填充
+    :return: BindingPlan
+    """
+    try:
+        ori_arg_dict = SIGNATURE_CACHE.args_dict(ori_func)
+    except:
+        return BindingPlan()
+    other_source = {}
+    consts = []
+    if other_func is not None:
+        try:
+            other_source = get_other_source_from_function(other_func, other_arg_count, other_kwarg_names, consts)
+        except:
+            other_source = {}
+    plan = BindingPlan(create_binder(ori_arg_dict, arg_count, kwarg_names, other_source, force, consts))
+    arg_keys = list(ori_arg_dict['arg'].keys())
+    if len(arg_keys) >= 1 and arg_keys[0] == 'self':
+        if hasattr(ori_func, '__self__'):
+            plan.self_source = 'ori'
+        elif other_func is not None and hasattr(other_func, '__self__'):
+            plan.self_source = 'other'
+        if plan.self_source is not None:
+            plan.injected_binder = create_binder(ori_arg_dict, arg_count + 1, kwarg_names, other_source, force, consts)
+    return plan
+
+
+class BindingPlanCache:
+    """
+    adapt_call的参数绑定方案的LRU缓存
+    key为(ori_func, args数量, kwargs的key, other_func, other args数量, other kwargs的key, force)，其中的函数由get_binding_identity转换
+    修改函数的默认值后会自动使用新的方案
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ori_func, arg_count: int, kwarg_names: tuple, other_func=None, other_arg_count: int = 0, other_kwarg_names: tuple = (), force=False) -> BindingPlan:
+        ori_key, ori_refs = get_binding_identity(ori_func)
+        other_key, other_refs = ((None,), ()) if other_func is None else get_binding_identity(other_func)
+        key = (ori_key, arg_count, kwarg_names, other_key, other_arg_count, other_kwarg_names, bool(force))
+        try:
+            plan = self._cache[key]
+        except KeyError:
+            plan = None
+        except TypeError:
+            self.misses += 1
+            return create_binding_plan(ori_func, arg_count, kwarg_names, other_func, other_arg_count, other_kwarg_names, force)
+        if plan is not None:
+            self.hits += 1
+            try:
+                self._cache.move_to_end(key)
+            except KeyError:
+                pass
+            return plan
+        self.misses += 1
+        plan = create_binding_plan(ori_func, arg_count, kwarg_names, other_func, other_arg_count, other_kwarg_names, force)
+        plan.refs = ori_refs + other_refs
+        self._cache[key] = plan
+        while len(self._cache) > self.max_size:
+            try:
+                self._cache.popitem(last=False)
+            except KeyError:
+                break
+        return plan
+
+    def info(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+        }
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+BINDING_PLAN_CACHE = BindingPlanCache()
 
 
 def adapt_call(ori_func, ori_args=None, ori_kwargs=None, other_func=None, other_args=None, other_kwargs=None, force=False):
     """
     在基础args和kwargs上，使用其他的args和kwargs对初始args和kwargs进行补充。在补充完毕后，传入函数进行运行。
     如果基础的args和kwargs存在多余的参数，那么也会被相应的删除
+    同一种输入形态的参数绑定方案会被缓存在BINDING_PLAN_CACHE中，之后的调用只需要下标和切片操作
     :param ori_func: 原始的function
     :param ori_args: 基础args
     :param ori_kwargs: 基础kwargs
@@ -822,82 +1544,84 @@ def adapt_call(ori_func, ori_args=None, ori_kwargs=None, other_func=None, other_
     :param force: 即使存在默认值，也会从other参数中选择并填充
     :return: 运行完毕后，返回
     """
-    args = []
-    kwargs = {}
-    arg_dict = {}
-    ori_args = [] if ori_args is None else list(ori_args)
-    ori_kwargs = {} if ori_kwargs is None else dict(ori_kwargs)
-    other_dict = {}
-    if other_func is not None:
-        other_args = [] if other_args is None else list(other_args)
-        other_kwargs = {} if other_kwargs is None else dict(other_kwargs)
-        try:
-            other_arg_dict = analyse_args_value_from_function(other_func, *other_args, **other_kwargs)
-        except:
-            pass
-        else:
-            for key in ['arg', 'args', 'kwarg']:
-                other_dict.update(other_arg_dict.get(key, {}))
-            if other_arg_dict.get('kwargs'):
-                other_dict.update(list(other_arg_dict['kwargs'].values())[0])
-    try:
-        ori_arg_dict = get_args_dict_from_function(ori_func)
-    except:
-        args = ori_args
-        kwargs = ori_kwargs
+    ori_args = () if ori_args is None else tuple(ori_args)
+    if type(ori_kwargs) is not dict:
+        ori_kwargs = {} if ori_kwargs is None else dict(ori_kwargs)
+    if other_func is None:
+        other_args = ()
+        other_kwargs = {}
     else:
-        arg_keys = list(ori_arg_dict['arg'].keys())
-        if len(arg_keys) >= 1:
-            if arg_keys[0] == 'self':
-                if hasattr(ori_func, '__self__'):
-                    ori_self = ori_func.__self__
-                    if len(ori_args) >= 1:
-                        if ori_args[0] != ori_self:
-                            ori_args.insert(0, ori_self)
-                    else:
-                        ori_args.insert(0, ori_self)
-                else:
-                    if other_func is not None and hasattr(other_func, '__self__'):
-                        ori_self = other_func.__self__
-                        if len(ori_args) >= 1:
-                            if ori_args[0] != ori_self:
-                                ori_args.insert(0, ori_self)
-                        else:
-                            ori_args.insert(0, ori_self)
-        now_index = 0
-        used_kwarg_key = []
-        for name, parameter in ori_arg_dict['arg'].items():
-            if len(ori_args) > now_index:
-                args.append(ori_args[now_index])
-            elif name in ori_kwargs:
-                args.append(ori_kwargs[name])
-                used_kwarg_key.append(name)
-            elif force or parameter.default is Signature.empty:
-                if name in other_dict:
-                    args.append(other_dict[name])
-            else:
-                args.append(parameter.default)
-            now_index += 1
-        if ori_arg_dict['args']:
-            args += ori_args[now_index:]
-        for name, parameter in ori_arg_dict['kwarg'].items():
-            if name in used_kwarg_key:
-                continue
-            elif name in ori_kwargs:
-                kwargs[name] = ori_kwargs[name]
-                used_kwarg_key.append(name)
-            elif force or parameter.default is Signature.empty:
-                if name in other_dict:
-                    kwargs[name] = other_dict[name]
-            else:
-                kwargs[name] = parameter.default
-        if ori_arg_dict['kwargs']:
-            for key, value in ori_kwargs.items():
-                if key not in used_kwarg_key:
-                    kwargs[key] = value
+        other_args = () if other_args is None else tuple(other_args)
+        other_kwargs = {} if other_kwargs is None else dict(other_kwargs)
+    plan = BINDING_PLAN_CACHE.get(ori_func, len(ori_args), tuple(ori_kwargs), other_func, len(other_args), tuple(other_kwargs), force)
+    args, kwargs = plan.bind(ori_args, ori_kwargs, other_args, other_kwargs, ori_func, other_func)
     return ori_func(*args, **kwargs)
 
 
+def adapt_call_chunk(ori_func, rows, other_func=None, other_args=None, other_kwargs=None, force=False) -> list:
+    """
+    adapt_map在executor中执行的单元，对一组参数依次执行adapt_call
+    :return: 结果的list
+    """
+    return list(adapt_map(ori_func, rows, other_func, other_args, other_kwargs, force))
+
+
+def adapt_map(ori_func, arg_iter, other_func=None, other_args=None, other_kwargs=None, force=False, executor=None, chunksize=1):
+    """
+    对多组参数依次执行adapt_call，相同形态的参数共用同一个参数绑定方案，结果以生成器的形式依次返回
+    :param ori_func: 原始的function
+    :param arg_iter: 可迭代对象，每个元素都是(args, kwargs)
+    :param other_func: 其他来源的function，所有参数共用
+    :param other_args: 补充args，所有参数共用
+    :param other_kwargs: 补充kwargs，所有参数共用
+    :param force: 即使存在默认值，也会从other参数中选择并填充
+    :param executor: concurrent.futures的Executor，输入时会按照chunksize分组后提交执行。使用进程池时，函数和参数都必须可以pickle
+    :param chunksize: 使用executor时，每组参数的数量
+    :return: 生成器，按照输入的顺序返回结果
+    """
+    if executor is not None:
+        return _adapt_map_executor(ori_func, arg_iter, other_func, other_args, other_kwargs, force, executor, chunksize)
+    return _adapt_map(ori_func, arg_iter, other_func, other_args, other_kwargs, force)
+
+
+def _adapt_map(ori_func, arg_iter, other_func, other_args, other_kwargs, force):
+    if other_func is None:
+        other_args = ()
+        other_kwargs = {}
+    else:
+        other_args = () if other_args is None else tuple(other_args)
+        other_kwargs = {} if other_kwargs is None else dict(other_kwargs)
+    other_arg_count = len(other_args)
+    other_kwarg_names = tuple(other_kwargs)
+    plan_dict = {}
+    for ori_args, ori_kwargs in arg_iter:
+        ori_args = () if ori_args is None else tuple(ori_args)
+        if type(ori_kwargs) is not dict:
+            ori_kwargs = {} if ori_kwargs is None else dict(ori_kwargs)
+        shape = (len(ori_args), tuple(ori_kwargs))
+        plan = plan_dict.get(shape)
+        if plan is None:
+            plan = BINDING_PLAN_CACHE.get(ori_func, shape[0], shape[1], other_func, other_arg_count, other_kwarg_names, force)
+            plan_dict[shape] = plan
+        args, kwargs = plan.bind(ori_args, ori_kwargs, other_args, other_kwargs, ori_func, other_func)
+        yield ori_func(*args, **kwargs)
+
+
+def _adapt_map_executor(ori_func, arg_iter, other_func, other_args, other_kwargs, force, executor, chunksize):
+    chunksize = max(1, int(chunksize))
+    max_pending = 2 * (os.cpu_count() or 1)
+    pending = deque()
+    arg_iter = iter(arg_iter)
+    while True:
+        chunk = list(itertools.islice(arg_iter, chunksize))
+        if chunk:
+            pending.append(executor.submit(adapt_call_chunk, ori_func, chunk, other_func, other_args, other_kwargs, force))
+        if pending and (not chunk or len(pending) >= max_pending):
+            yield from pending.popleft().result()
+        elif not chunk:
+            break
+
+
 def decorate_class_function_include(decorator, *include, param=False, args=None, kwargs=None, regex=True, parent=False, class_method=True, static_method=True):
     """
     类装饰器
@@ -954,7 +1678,7 @@ def decorate_class_function_include(decorator, *include, param=False, args=None,
                             setattr(cls, attr_name, new_func)
         return cls
 
-    return wrapper
+    return DECORATION_PROFILER.instrument(wrapper) if DECORATION_PROFILER.enabled else wrapper
 
 
 def decorate_class_function_exclude(decorator, *exclude, param=False, args=None, kwargs=None, regex=True, parent=False, class_method=True, static_method=True):
@@ -1014,7 +1738,7 @@ def decorate_class_function_exclude(decorator, *exclude, param=False, args=None,
 
         return cls
 
-    return wrapper
+    return DECORATION_PROFILER.instrument(wrapper) if DECORATION_PROFILER.enabled else wrapper
 
 
 def decorator_class_including_parents(decorator, exclude_class=object, param=False, args=None, kwargs=None):
@@ -1047,10 +1771,6 @@ def decorator_class_including_parents(decorator, exclude_class=object, param=Fal
     return wrapper
 
 
-STACK.this_file_lineno_should_ignore(395, check_text='__re_value = func(*__func_args, **__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(690, check_text='__re_value = func(*__func_args, **__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(738, check_text='__re_value = func(*__func_args, **__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(785, check_text='__re_value = func(*__func_args, **__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(450, check_text='__re_value = func(**__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(506, check_text='__re_value = func(**__func_kwargs)  # noqa')
-STACK.this_file_lineno_should_ignore(898, check_text='return ori_func(*args, **kwargs)')
+STACK.ignore_function(LazyFunction.__call__)
+STACK.ignore_function(adapt_call)
+STACK.ignore_function(_adapt_map)
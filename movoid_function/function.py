@@ -6,11 +6,41 @@
 # Time          : 2024/4/13 16:35
 # Description   : 
 """
+import bisect
 import inspect
+import itertools
+import random
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from types import CodeType
+from typing import Dict, List, Optional
 
 from .stack import STACK
 from .decorator import adapt_call
 
+LATENCY_BUCKETS = [2 ** _ / 1e6 for _ in range(21)]
+SAMPLE_FLUSH_SIZE = 1024
+REPLACE_SERIAL = itertools.count()
+REPLACE_STATE_EMPTY = (None, None, None, None)
+SHADOW_EXECUTOR: Optional[ThreadPoolExecutor] = None
+SHADOW_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_shadow_executor() -> ThreadPoolExecutor:
+    """
+    影子调用默认共用的线程池，第一次使用时才创建
+    """
+    global SHADOW_EXECUTOR
+    with SHADOW_EXECUTOR_LOCK:
+        if SHADOW_EXECUTOR is None:
+            SHADOW_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='movoid_shadow')
+    return SHADOW_EXECUTOR
+
 
 class Function:
     def __init__(self, func=None, args=None, kwargs=None, empty_ok=True):
@@ -61,7 +91,243 @@ class Function:
         return self._func.__code__.co_firstlineno
 
 
+class ShadowStats:
+    """
+    影子调用的统计结果，所有时间的单位都是秒
+    """
+
+    def __init__(self, mismatch_size=10):
+        self._lock = threading.Lock()
+        self.mismatch_list = deque(maxlen=mismatch_size)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.submitted = 0
+            self.dropped = 0
+            self.pending = 0
+            self.matched = 0
+            self.mismatched = 0
+            self.errors = 0
+            self.primary_seconds = 0.0
+            self.shadow_seconds = 0.0
+            self.mismatch_list.clear()
+
+    def _submit(self, max_pending) -> bool:
+        with self._lock:
+            if self.pending >= max_pending:
+                self.dropped += 1
+                return False
+            self.submitted += 1
+            self.pending += 1
+            return True
+
+    def _finish(self, primary_seconds, shadow_seconds, matched, error, mismatch):
+        with self._lock:
+            self.pending -= 1
+            self.primary_seconds += primary_seconds
+            self.shadow_seconds += shadow_seconds
+            if error:
+                self.errors += 1
+            elif matched:
+                self.matched += 1
+            else:
+                self.mismatched += 1
+            if mismatch is not None:
+                self.mismatch_list.append(mismatch)
+
+    def info(self) -> dict:
+        """
+        :return: 各项计数，以及主调用和影子调用的平均耗时、影子调用相对主调用的耗时比例
+        """
+        with self._lock:
+            finished = self.matched + self.mismatched + self.errors
+            return {
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'pending': self.pending,
+                'matched': self.matched,
+                'mismatched': self.mismatched,
+                'errors': self.errors,
+                'primary_mean': self.primary_seconds / finished if finished else 0.0,
+                'shadow_mean': self.shadow_seconds / finished if finished else 0.0,
+                'ratio': self.shadow_seconds / self.primary_seconds if self.primary_seconds else 0.0,
+            }
+
+
+class ShadowTraffic:
+    """
+    ReplaceFunction的影子调用配置：按照比例抽样，主调用正常返回后，在线程池中使用相同的参数调用另一个history，比较结果和耗时
+    影子调用只执行history中的函数本身，不执行它的setup和teardown，也不会修改main_return等返回值
+    参数会被两次调用共用，所以影子函数不应该修改参数或者产生其他副作用
+    """
+
+    def __init__(self, index, rate=1.0, compare=None, executor=None, max_pending=1000):
+        self.index = index
+        self.rate = float(rate)
+        self.compare = compare
+        self.executor = executor
+        self.max_pending = max_pending
+        self.stats = ShadowStats()
+
+    def call(self, replace_function, args, kwargs):
+        start = time.perf_counter()
+        primary_return = replace_function._call_primary(args, kwargs)
+        primary_seconds = time.perf_counter() - start
+        if self.stats._submit(self.max_pending):
+            executor = get_shadow_executor() if self.executor is None else self.executor
+            try:
+                executor.submit(self._run, replace_function.history[self.index], args, kwargs, primary_return, primary_seconds)
+            except RuntimeError:
+                self.stats._finish(primary_seconds, 0.0, False, True, None)
+        return primary_return
+
+    def _run(self, shadow_func, args, kwargs, primary_return, primary_seconds):
+        start = time.perf_counter()
+        try:
+            shadow_return = adapt_call(shadow_func, args, kwargs)
+        except Exception as err:
+            self.stats._finish(primary_seconds, time.perf_counter() - start, False, True, (args, kwargs, primary_return, err))
+            return
+        shadow_seconds = time.perf_counter() - start
+        try:
+            matched = bool(primary_return == shadow_return if self.compare is None else self.compare(primary_return, shadow_return))
+        except Exception as err:
+            self.stats._finish(primary_seconds, shadow_seconds, False, True, (args, kwargs, primary_return, err))
+            return
+        self.stats._finish(primary_seconds, shadow_seconds, matched, False, None if matched else (args, kwargs, primary_return, shadow_return))
+
+
+class RouteRecord:
+    """
+    某一个history的调用统计，histogram[i]为耗时不超过LATENCY_BUCKETS[i]的调用次数，最后一个为超过所有区间的次数
+    """
+    __slots__ = ('count', 'errors', 'seconds', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def percentile(self, percent) -> float:
+        """
+        根据直方图估算耗时的百分位数，返回所在区间的上限，落在最后一个区间时返回inf
+        :param percent: 0~100
+        """
+        target = self.count * percent / 100
+        total = 0
+        for bucket, number in enumerate(self.histogram):
+            total += number
+            if number and total >= target:
+                return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else float('inf')
+        return 0.0
+
+
+class CanaryRouting:
+    """
+    ReplaceFunction的按权重分流配置，每次调用按照权重随机选择一个history，并统计每个history的调用次数和耗时直方图
+    """
+
+    def __init__(self, weight_dict: Dict[int, float]):
+        self.index_list: List[int] = []
+        self.cumulative_list: List[float] = []
+        total = 0.0
+        for index, weight in weight_dict.items():
+            if weight < 0:
+                raise ValueError(f'weight of index {index} should not be negative: {weight}')
+            if weight > 0:
+                total += weight
+                self.index_list.append(index)
+                self.cumulative_list.append(total)
+        if total <= 0:
+            raise ValueError(f'at least one weight should be positive: {weight_dict}')
+        self.total = total
+        self.cumulative_list[-1] = float('inf')
+        self.record_dict: Dict[int, RouteRecord] = {_: RouteRecord() for _ in self.index_list}
+        self._sample_list = deque()
+        self._lock = threading.Lock()
+
+    def choose(self) -> int:
+        """
+        按照权重随机选择一个history下标
+        """
+        return self.index_list[bisect.bisect(self.cumulative_list, random.random() * self.total)]
+
+    def call(self, replace_function, args, kwargs):
+        index = self.choose()
+        plan = replace_function.get_plan(index)
+        start = time.perf_counter()
+        try:
+            re_value = replace_function._run(plan, args, kwargs)
+        except BaseException:
+            self._add(index, time.perf_counter() - start, True)
+            raise
+        self._add(index, time.perf_counter() - start, False)
+        return re_value
+
+    def _add(self, index, seconds, error):
+        """
+        deque.append本身是线程安全的，调用时只记录，积累到一定数量或者获取统计结果时才加锁汇总
+        """
+        self._sample_list.append((index, seconds, error))
+        if len(self._sample_list) >= SAMPLE_FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            sample_list = self._sample_list
+            record_dict = self.record_dict
+            for _ in range(len(sample_list)):
+                index, seconds, error = sample_list.popleft()
+                record = record_dict[index]
+                record.count += 1
+                record.seconds += seconds
+                record.histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                if error:
+                    record.errors += 1
+
+    def info(self) -> Dict[int, dict]:
+        """
+        :return: {history下标: {权重占比、调用次数、失败次数、平均耗时、p50、p90、p99}}
+        """
+        self._flush()
+        with self._lock:
+            re_dict = {}
+            last = 0.0
+            for index, cumulative in zip(self.index_list, self.cumulative_list):
+                cumulative = min(cumulative, self.total)
+                record = self.record_dict[index]
+                re_dict[index] = {
+                    'share': (cumulative - last) / self.total,
+                    'count': record.count,
+                    'errors': record.errors,
+                    'mean': record.seconds / record.count if record.count else 0.0,
+                    'p50': record.percentile(50),
+                    'p90': record.percentile(90),
+                    'p99': record.percentile(99),
+                }
+                last = cumulative
+            return re_dict
+
+
+class ReturnKey:
+    """
+    ReplaceFunction的返回值在上下文中的凭证
+    上下文中只保存凭证，返回值保存在ReplaceFunction中，ReplaceFunction被回收时返回值也会被回收，
+    凭证被回收时，通过弱引用的回调删除对应的返回值
+    """
+    __slots__ = ('__weakref__',)
+
+
 class ReplaceFunction:
+    """
+    替换后的函数，按照history中的某一个函数执行
+    返回值（main_return、setup_return、teardown_return）的凭证和multi_use_ori/multi_use_last的切换保存在每个实例自己的ContextVar中，
+    值为不可变的tuple(setup凭证, main凭证, teardown凭证, 切换)，不同的线程和asyncio的task之间相互独立，并发调用时不需要加锁
+    index、use_ori、use_last修改的是所有调用者共用的下标
+    """
+
     def __init__(self, ori_func, tar_func, setup=None, teardown=None):
         if isinstance(ori_func, ReplaceFunction):
             self._history = ori_func.history
@@ -83,31 +349,115 @@ class ReplaceFunction:
             real_teardown = None
         self._teardown.append(real_teardown)
         self._index = -1
-        self._setup_return = None
-        self._teardown_return = None
-        self._main_return = None
-        self._ori_count = 0
+        self._serial = next(REPLACE_SERIAL)
+        self._state = ContextVar(f'movoid_replace_{self._serial}', default=REPLACE_STATE_EMPTY)
+        self._return_store = {}
+        self._return_release = self._return_store.pop
+        self._shadow: Optional[ShadowTraffic] = None
+        self._routing: Optional[CanaryRouting] = None
+        self._plan_dict = {}
+        self._plan = None
         self.use_last()
 
     def __call__(self, *args, **kwargs):
-        return self.call()(*args, **kwargs)
+        shadow = self._shadow
+        if shadow is not None and random.random() < shadow.rate:
+            return shadow.call(self, args, kwargs)
+        override = self._state.get()[3]
+        if override is None and self._routing is not None:
+            return self._routing.call(self, args, kwargs)
+        return self._run(self._plan if override is None else self.get_plan(override[1]), args, kwargs)
+
+    def _run(self, plan, args, kwargs):
+        """
+        按照执行计划执行，并记录返回值
+        """
+        setup_steps, setup_pos, main_func, teardown_steps, teardown_pos = plan
+        if setup_steps:
+            self._set_return(0, [adapt_call(_, args, kwargs) for _ in setup_steps][setup_pos])
+        _main_return = adapt_call(main_func, args, kwargs)
+        self._set_return(1, _main_return)
+        if teardown_steps:
+            self._set_return(2, [adapt_call(_, args, kwargs) for _ in teardown_steps][teardown_pos])
+        return _main_return
+
+    def _set_return(self, slot, value):
+        """
+        在当前上下文中记录返回值
+        :param slot: 0为setup，1为main，2为teardown
+        :param value: 返回值
+        """
+        key = ReturnKey()
+        self._return_store[weakref.ref(key, self._return_release)] = value
+        state = self._state.get()
+        self._state.set(state[:slot] + (key,) + state[slot + 1:])
+
+    def _get_return(self, slot):
+        key = self._state.get()[slot]
+        return None if key is None else self._return_store.get(weakref.ref(key))
+
+    def _set_override(self, override):
+        self._state.set(self._state.get()[:3] + (override,))
+
+    def _call_primary(self, args, kwargs):
+        """
+        不经过影子调用，按照分流配置或者当前上下文中的下标执行
+        """
+        override = self._state.get()[3]
+        if override is None and self._routing is not None:
+            return self._routing.call(self, args, kwargs)
+        return self._run(self._plan if override is None else self.get_plan(override[1]), args, kwargs)
+
+    def _flatten(self, index):
+        """
+        把某个history展开为按顺序执行的函数列表：setup展开后的列表、自身、teardown展开后的列表
+        :return: (函数列表, 自身在列表中的位置)
+        """
+        steps = []
+        if self._setup[index] is not None:
+            steps += self._flatten(self._setup[index])[0]
+        main_pos = len(steps)
+        steps.append(self._history[index])
+        if self._teardown[index] is not None:
+            steps += self._flatten(self._teardown[index])[0]
+        return steps, main_pos
+
+    def get_plan(self, index=None):
+        """
+        获取某个history的执行计划，计划会按照下标缓存
+        :param index: history的下标，默认为当前上下文中的下标
+        :return: (setup函数列表, setup返回值的位置, 主函数, teardown函数列表, teardown返回值的位置)
+        """
+        index = index % len(self._history) if isinstance(index, int) else self.index
+        plan = self._plan_dict.get(index)
+        if plan is None:
+            setup_steps, setup_pos = ((), None) if self._setup[index] is None else self._flatten(self._setup[index])
+            teardown_steps, teardown_pos = ((), None) if self._teardown[index] is None else self._flatten(self._teardown[index])
+            plan = (tuple(setup_steps), setup_pos, self._history[index], tuple(teardown_steps), teardown_pos)
+            self._plan_dict[index] = plan
+        return plan
+
+    def refresh_plan(self):
+        """
+        清空执行计划的缓存并重新生成当前下标的计划。直接修改了history、setup或teardown之后需要调用
+        """
+        self._plan_dict = {}
+        self._plan = self.get_plan(self._index)
+        return self
 
     def call(self, index=None, refresh_return=True):
-        index = index % len(self._history) if isinstance(index, int) else self._index
+        plan = self.get_plan(index)
+        setup_steps, setup_pos, main_func, teardown_steps, teardown_pos = plan
         refresh_return = refresh_return if isinstance(refresh_return, bool) else True
 
         def wrapper(*args, **kwargs):
-            if self._setup[index] is not None:
-                _setup_return = self.call(self._setup[index], False)(*args, **kwargs)
-                if refresh_return:
-                    self._setup_return = _setup_return
-            _main_return = adapt_call(self._history[index], args, kwargs)
             if refresh_return:
-                self._main_return = _main_return
-            if self._teardown[index] is not None:
-                _teardown_return = self.call(self._teardown[index], False)(*args, **kwargs)
-                if refresh_return:
-                    self._teardown_return = _teardown_return
+                return self._run(plan, args, kwargs)
+            for func in setup_steps:
+                adapt_call(func, args, kwargs)
+            _main_return = adapt_call(main_func, args, kwargs)
+            for func in teardown_steps:
+                adapt_call(func, args, kwargs)
             return _main_return
 
         return wrapper
@@ -118,7 +468,7 @@ class ReplaceFunction:
 
     @property
     def target(self):
-        return self._history[self._index]
+        return self._history[self.index]
 
     @property
     def last(self):
@@ -130,24 +480,30 @@ class ReplaceFunction:
 
     @property
     def index(self):
-        return self._index
+        """
+        当前上下文中实际使用的下标，multi_use_ori生效时为0
+        """
+        override = self._state.get()[3]
+        return self._index if override is None else override[1]
 
     @index.setter
     def index(self, value):
         value = int(value) % len(self._history)
         self._index = value
+        self._plan = self.get_plan(value)
+        self._routing = None
 
     @property
     def main_return(self):
-        return self._main_return
+        return self._get_return(1)
 
     @property
     def setup_return(self):
-        return self._setup_return
+        return self._get_return(0)
 
     @property
     def teardown_return(self):
-        return self._teardown_return
+        return self._get_return(2)
 
     def use_ori(self):
         self.index = 0
@@ -157,19 +513,83 @@ class ReplaceFunction:
         self.index = -1
         return self
 
+    def set_route(self, weights) -> CanaryRouting:
+        """
+        按照权重把调用分配到多个history，例如{0: 95, -1: 5}。设置index、use_ori、use_last时分流会被取消
+        multi_use_ori生效的上下文中不分流
+        :param weights: {history下标: 权重}，或者和history等长的权重列表
+        :return: 分流配置，可以通过它的info获取每个history的调用次数和耗时
+        """
+        weight_dict = {}
+        for index, weight in (weights.items() if isinstance(weights, dict) else enumerate(weights)):
+            index = int(index) % len(self._history)
+            weight_dict[index] = weight_dict.get(index, 0) + float(weight)
+        self._routing = CanaryRouting(weight_dict)
+        return self._routing
+
+    def clear_route(self) -> Optional[CanaryRouting]:
+        """
+        取消分流，恢复使用共用的下标
+        :return: 之前的分流配置，没有设置时为None
+        """
+        routing, self._routing = self._routing, None
+        return routing
+
+    @property
+    def routing(self) -> Optional[CanaryRouting]:
+        return self._routing
+
+    def start_shadow(self, index=0, rate=1.0, compare=None, executor=None, max_pending=1000) -> ShadowStats:
+        """
+        开启影子调用：调用者依然使用当前的下标，同时按照比例抽样，在后台使用相同的参数调用另一个history，比较结果和耗时
+        :param index: 影子调用使用的history下标，默认为原始函数
+        :param rate: 抽样比例，0~1
+        :param compare: 比较函数，输入(主调用返回值, 影子调用返回值)，返回是否一致。默认使用==
+        :param executor: 执行影子调用的线程池，默认使用共用的线程池
+        :param max_pending: 最多同时等待执行的影子调用数量，超过时直接放弃，避免积压
+        :return: 统计结果
+        """
+        self._shadow = ShadowTraffic(int(index) % len(self._history), rate, compare, executor, max_pending)
+        return self._shadow.stats
+
+    def stop_shadow(self) -> Optional[ShadowStats]:
+        """
+        关闭影子调用，已经提交的影子调用依然会执行完毕并统计
+        :return: 统计结果，没有开启时为None
+        """
+        shadow, self._shadow = self._shadow, None
+        return None if shadow is None else shadow.stats
+
+    @property
+    def shadow_stats(self) -> Optional[ShadowStats]:
+        return None if self._shadow is None else self._shadow.stats
+
     def multi_use_ori(self):
-        self._ori_count += 1
-        self.index = 0
+        """
+        在当前上下文中切换到原始函数，可以嵌套，需要和multi_use_last成对使用
+        """
+        override = self._state.get()[3]
+        self._set_override((1 if override is None else override[0] + 1, 0))
         return self
 
     def multi_use_last(self):
-        self._ori_count -= 1
-        self._ori_count = max(0, self._ori_count)
-        if self._ori_count == 0:
-            self.index = -1
+        """
+        抵消一次multi_use_ori，全部抵消后当前上下文恢复使用共用的下标
+        """
+        override = self._state.get()[3]
+        if override is not None:
+            self._set_override(None if override[0] <= 1 else (override[0] - 1, 0))
         return self
 
 
+def get_owner_module(func):
+    """
+    获取函数所在的模块，优先直接使用__module__在sys.modules中查找，找不到时才使用inspect.getmodule
+    """
+    module = sys.modules.get(getattr(func, '__module__', None) or '')
+    return inspect.getmodule(func) if module is None else module
+
+
 def replace_function(ori_func, tar_func, setup=None, teardown=None):
     """
     将固有的函数替换为目标函数，一般是用于替换builtin的函数，或者一些包的直接定义的函数
@@ -183,21 +603,161 @@ def replace_function(ori_func, tar_func, setup=None, teardown=None):
         ori = ori_func.origin
     else:
         ori = ori_func
-    ori_package = inspect.getmodule(ori)
+    ori_package = get_owner_module(ori)
     func_name = ori.__name__
     setattr(ori_package, func_name, ReplaceFunction(ori_func, tar_func, setup=setup, teardown=teardown))
 
 
 def restore_function(tar_func):
     if isinstance(tar_func, ReplaceFunction):
-        ori_package = inspect.getmodule(tar_func.origin)
+        ori_package = get_owner_module(tar_func.origin)
         func_name = tar_func.origin.__name__
         setattr(ori_package, func_name, tar_func.origin)
 
 
-STACK.this_file_lineno_should_ignore(42, check_text='re_value = self._func(*args, **kwargs)')
-STACK.this_file_lineno_should_ignore(44, check_text='re_value = self._func(*self._args, **self._kwargs)')
-STACK.this_file_lineno_should_ignore(93, check_text='return self.call()(*args, **kwargs)')
-STACK.this_file_lineno_should_ignore(101, check_text='_setup_return = self.call(self._setup[index], False)(*args, **kwargs)')
-STACK.this_file_lineno_should_ignore(104, check_text='_main_return = adapt_call(self._history[index], args, kwargs)')
-STACK.this_file_lineno_should_ignore(108, check_text='_teardown_return = self.call(self._teardown[index], False)(*args, **kwargs)')
+def build_alias_index(func_list, module_list=None) -> dict:
+    """
+    只遍历一次模块，找到所有引用了这些函数的模块属性，例如from module import func产生的别名
+    :param func_list: 需要查找的函数
+    :param module_list: 需要遍历的模块，默认为sys.modules中的全部模块
+    :return: {id(函数): [(模块, 属性名)]}
+    """
+    alias_index = {id(_): [] for _ in func_list}
+    for module in (list(sys.modules.values()) if module_list is None else module_list):
+        module_dict = getattr(module, '__dict__', None)
+        if not isinstance(module_dict, dict):
+            continue
+        for name, value in list(module_dict.items()):
+            alias_list = alias_index.get(id(value))
+            if alias_list is not None:
+                alias_list.append((module, name))
+    return alias_index
+
+
+class ReplaceTransaction:
+    """
+    批量替换函数，所有替换一起生效，并且可以一起恢复
+    transaction = ReplaceTransaction(rebind_alias=True)
+    transaction.add(time.time, fake_time).add(print, fake_print)
+    with transaction:
+        ...
+    生效之前add只是记录，apply（或进入with）时统一生效，如果中途失败，这一批已经生效的替换会被撤销
+    生效之后再add的替换会立即生效
+    restore（或退出with）时按照相反的顺序恢复为替换前的值
+    """
+
+    def __init__(self, rebind_alias=False, module_list=None):
+        """
+        :param rebind_alias: 是否同时替换其他模块中通过from module import func得到的别名
+        :param module_list: 查找别名时遍历的模块，默认为sys.modules中的全部模块
+        """
+        self.rebind_alias = rebind_alias
+        self.module_list = module_list
+        self.active = False
+        self._todo_list = []
+        self._record_list = []
+
+    def add(self, ori_func, tar_func, setup=None, teardown=None):
+        """
+        参数和replace_function相同
+        :return: self
+        """
+        self._todo_list.append((ori_func, tar_func, setup, teardown))
+        if self.active:
+            self.apply()
+        return self
+
+    def apply(self):
+        """
+        使所有记录的替换生效。所有模块只解析一次，所有ReplaceFunction都创建成功后才开始替换
+        任何一步失败时，已经创建的ReplaceFunction和已经生效的替换都会被撤销，记录的替换会保留，不会生效任何一个
+        """
+        todo_list = list(self._todo_list)
+        module_dict = {}
+        patch_list = []
+        record_count = len(self._record_list)
+        try:
+            for ori_func, tar_func, setup, teardown in todo_list:
+                ori = ori_func.origin if isinstance(ori_func, ReplaceFunction) else ori_func
+                module_name = getattr(ori, '__module__', None)
+                module = module_dict.get(module_name)
+                if module is None:
+                    module = get_owner_module(ori)
+                    module_dict[module_name] = module
+                func_name = ori.__name__
+                patch_list.append((module, func_name, ori_func, ReplaceFunction(ori_func, tar_func, setup=setup, teardown=teardown)))
+            alias_index = build_alias_index([_[2] for _ in patch_list], self.module_list) if self.rebind_alias else {}
+            for module, func_name, ori_func, replace in patch_list:
+                self._patch(module, func_name, replace)
+                for alias_module, alias_name in alias_index.get(id(ori_func), ()):
+                    if alias_module is not module or alias_name != func_name:
+                        self._patch(alias_module, alias_name, replace)
+        except BaseException:
+            self._restore_record(self._record_list[record_count:])
+            del self._record_list[record_count:]
+            self._discard_replace(patch_list)
+            raise
+        del self._todo_list[:len(todo_list)]
+        self.active = True
+        return self
+
+    @staticmethod
+    def _discard_replace(patch_list):
+        """
+        撤销创建ReplaceFunction时对原有ReplaceFunction的history、setup、teardown的追加
+        """
+        for module, func_name, ori_func, replace in reversed(patch_list):
+            if isinstance(ori_func, ReplaceFunction):
+                del replace._history[-1]
+                del replace._setup[-1]
+                del replace._teardown[-1]
+                ori_func.refresh_plan()
+
+    def _patch(self, module, name, replace):
+        self._record_list.append((module, name, getattr(module, name), replace))
+        setattr(module, name, replace)
+
+    @staticmethod
+    def _restore_record(record_list):
+        for module, name, previous, replace in reversed(record_list):
+            if getattr(module, name, None) is replace:
+                setattr(module, name, previous)
+
+    def restore(self):
+        """
+        按照相反的顺序恢复所有替换。如果某个属性在之后又被其他地方修改，那么这个属性不会被恢复
+        """
+        record_list, self._record_list = self._record_list, []
+        self.active = False
+        self._restore_record(record_list)
+        return self
+
+    def __enter__(self):
+        return self.apply()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.restore()
+
+
+STACK.ignore_function(Function.__call__)
+STACK.ignore_function(ReplaceFunction.__call__)
+STACK.ignore_function(ReplaceFunction._run)
+STACK.ignore_function(ShadowTraffic.call)
+STACK.ignore_function(CanaryRouting.call)
+STACK.ignore_function(ReplaceFunction._call_primary)
+
+
+def _inner_code_list(code):
+    """
+    code中定义的所有内部code（闭包、推导式等），包括嵌套的
+    """
+    code_list = []
+    for inner_code in code.co_consts:
+        if isinstance(inner_code, CodeType):
+            code_list.append(inner_code)
+            code_list += _inner_code_list(inner_code)
+    return code_list
+
+
+for _code in _inner_code_list(ReplaceFunction._run.__code__) + _inner_code_list(ReplaceFunction.call.__code__):
+    STACK.ignore_function(_code)
@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : logger
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 20:00
+# Description   : 让logging记录的调用位置遵循STACK的跳过规则，%(module)s、%(lineno)d、%(funcName)s等字段显示真正的调用者
+"""
+import io
+import logging
+import sys
+import traceback
+from types import MethodType
+
+from .stack import STACK, DECORATOR
+
+LOGGING_FILE = logging.addLevelName.__code__.co_filename
+THIS_FILE = sys._getframe().f_code.co_filename
+
+
+def is_logging_frame(frame) -> bool:
+    """
+    判断frame是否属于logging模块本身（包括LoggerAdapter）、本模块或者import机制
+    """
+    filename = frame.f_code.co_filename
+    return filename == LOGGING_FILE or filename == THIS_FILE or ('importlib' in filename and '_bootstrap' in filename)
+
+
+def find_caller(stack_info=False, stacklevel=1, skip_ignore_level=DECORATOR):
+    """
+    logging.Logger.findCaller的替代实现，在原有的基础上跳过所有STACK规则中需要跳过的frame
+    直接在原始frame上回溯，只使用STACK的判定缓存，不创建StackFrame
+    和logging一样，stacklevel超过栈的深度时使用最外层的frame
+    :param stack_info: 是否需要附带栈信息
+    :param stacklevel: 和logging中的stacklevel含义相同，1为调用log的函数
+    :param skip_ignore_level: 跳过规则的等级
+    :return: (文件名, 行号, 函数名, 栈信息)
+    """
+    frame = sys._getframe(1)
+    while frame is not None and is_logging_frame(frame):
+        frame = frame.f_back
+    while frame is not None and STACK._frame_should_ignore(frame, skip_ignore_level):
+        frame = frame.f_back
+    if frame is None:
+        return '(unknown file)', 0, '(unknown function)', None
+    for _ in range(stacklevel - 1):
+        next_frame = frame.f_back
+        while next_frame is not None and STACK._frame_should_ignore(next_frame, skip_ignore_level):
+            next_frame = next_frame.f_back
+        if next_frame is None:
+            break
+        frame = next_frame
+    sinfo = None
+    if stack_info:
+        with io.StringIO() as sio:
+            sio.write('Stack (most recent call last):\n')
+            traceback.print_stack(frame, file=sio)
+            sinfo = sio.getvalue()
+            if sinfo[-1] == '\n':
+                sinfo = sinfo[:-1]
+    code = frame.f_code
+    return code.co_filename, frame.f_lineno, code.co_name, sinfo
+
+
+class StackLogger(logging.Logger):
+    """
+    遵循STACK跳过规则的Logger，可以通过logging.setLoggerClass(StackLogger)让之后创建的logger都使用它
+    已经存在的logger可以使用use_stack_caller
+    """
+    skip_ignore_level = DECORATOR
+
+    def findCaller(self, stack_info=False, stacklevel=1):
+        return find_caller(stack_info, stacklevel, self.skip_ignore_level)
+
+
+def _find_caller_method(self, stack_info=False, stacklevel=1):
+    return find_caller(stack_info, stacklevel, getattr(self, 'skip_ignore_level', DECORATOR))
+
+
+def use_stack_caller(logger: logging.Logger, skip_ignore_level=DECORATOR) -> logging.Logger:
+    """
+    让一个已经存在的logger（例如root logger）也遵循STACK的跳过规则
+    :param logger: 目标logger
+    :param skip_ignore_level: 跳过规则的等级
+    :return: 原logger
+    """
+    logger.skip_ignore_level = skip_ignore_level
+    logger.findCaller = MethodType(_find_caller_method, logger)
+    return logger
@@ -0,0 +1,154 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : profiler
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 18:00
+# Description   : 统计wraps系列装饰器和类装饰器在装饰时所消耗的时间和内存，按照被装饰函数所在的模块分组
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+PROFILE_ENV = 'MOVOID_FUNCTION_PROFILE'
+
+
+class DecorationRecord:
+    """
+    某个模块中某一种装饰器的统计结果
+    """
+    __slots__ = ('count', 'seconds', 'memory')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.memory = 0
+
+
+class DecorationProfiler:
+    """
+    装饰过程的分析器，默认关闭
+    可以通过环境变量MOVOID_FUNCTION_PROFILE开启：值为1时在程序退出时把报告打印到stderr，为其他值时视为报告的文件路径
+    也可以调用enable开启，调用report随时获取报告
+    统计的时间和内存都是包含关系，例如decorate_class_function_include中包含了其内部wraps的消耗
+    开启之前就已经调用wraps等函数得到的装饰器不会被统计
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self._record_dict: Dict[Tuple[str, str], DecorationRecord] = {}
+        self._lock = threading.Lock()
+        self._report_at_exit = None
+        self._start_tracemalloc = False
+
+    def enable(self, trace_memory=True, report_at_exit=None):
+        """
+        开启分析
+        :param trace_memory: 是否使用tracemalloc统计装饰后新增的内存
+        :param report_at_exit: 程序退出时报告的输出位置。None为不报告，'-'为stderr，其他为文件路径
+        """
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._start_tracemalloc = True
+        if report_at_exit is not None and self._report_at_exit is None:
+            atexit.register(self._report_exit)
+        if report_at_exit is not None:
+            self._report_at_exit = report_at_exit
+        self.enabled = True
+
+    def disable(self):
+        """
+        关闭分析，已经统计的结果会保留。由enable开启的tracemalloc也会被关闭
+        """
+        self.enabled = False
+        if self._start_tracemalloc:
+            tracemalloc.stop()
+            self._start_tracemalloc = False
+
+    def clear(self):
+        with self._lock:
+            self._record_dict.clear()
+
+    def instrument(self, func, meta_func=None):
+        """
+        包装一个装饰过程函数，使其执行时被统计
+        :param func: 装饰过程函数，只接收被装饰的对象。统计的装饰器名称为其所在的最外层函数名
+        :param meta_func: 提供模块名的函数，默认为被装饰的对象
+        :return: 包装后的函数
+        """
+        kind = func.__qualname__.split('.')[0]
+
+        def profiled(target):
+            module = getattr(target if meta_func is None else meta_func, '__module__', None) or '<unknown>'
+            trace_memory = self.trace_memory and tracemalloc.is_tracing()
+            memory = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+            start = time.perf_counter()
+            try:
+                return func(target)
+            finally:
+                seconds = time.perf_counter() - start
+                memory = tracemalloc.get_traced_memory()[0] - memory if trace_memory else 0
+                self._add(module, kind, seconds, memory)
+
+        return profiled
+
+    def _add(self, module: str, kind: str, seconds: float, memory: int):
+        with self._lock:
+            record = self._record_dict.get((module, kind))
+            if record is None:
+                record = DecorationRecord()
+                self._record_dict[(module, kind)] = record
+            record.count += 1
+            record.seconds += seconds
+            record.memory += memory
+
+    def records(self) -> List[Tuple[str, str, int, float, int]]:
+        """
+        :return: [(模块, 装饰器, 次数, 秒, 新增内存字节数)]，按照模块总耗时从高到低排列，同一模块内按照耗时排列
+        """
+        with self._lock:
+            items = [(k[0], k[1], v.count, v.seconds, v.memory) for k, v in self._record_dict.items()]
+        module_seconds = {}
+        for item in items:
+            module_seconds[item[0]] = module_seconds.get(item[0], 0.0) + item[3]
+        items.sort(key=lambda _: (-module_seconds[_[0]], _[0], -_[3]))
+        return items
+
+    def report(self, limit=None, file=None) -> str:
+        """
+        生成报告文本
+        :param limit: 最多显示多少个模块，默认全部
+        :param file: 如果传入，那么把报告写入这个文件对象
+        :return: 报告文本
+        """
+        lines = [f'{"module":<40}{"decorator":<34}{"count":>8}{"total ms":>12}{"mean us":>10}{"KiB":>10}']
+        module_list = []
+        for module, kind, count, seconds, memory in self.records():
+            if module not in module_list:
+                if limit is not None and len(module_list) >= limit:
+                    break
+                module_list.append(module)
+            lines.append(f'{module:<40}{kind:<34}{count:>8}{seconds * 1000:>12.2f}{seconds / count * 1e6:>10.1f}{memory / 1024:>10.1f}')
+        text = '\n'.join(lines) + '\n'
+        if file is not None:
+            file.write(text)
+        return text
+
+    def _report_exit(self):
+        if self._report_at_exit == '-':
+            self.report(file=sys.stderr)
+        else:
+            with open(self._report_at_exit, 'w', encoding='utf8') as f:
+                self.report(file=f)
+
+
+DECORATION_PROFILER = DecorationProfiler()
+
+if os.environ.get(PROFILE_ENV, '') not in ('', '0'):
+    DECORATION_PROFILER.enable(report_at_exit='-' if os.environ[PROFILE_ENV] == '1' else os.environ[PROFILE_ENV])
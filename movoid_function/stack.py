@@ -7,11 +7,15 @@
 # Description   : 
 """
 import inspect
+import linecache
 import math
 import pathlib
 import sys
+import threading
 import types
-from typing import List, Tuple, Optional, Union, Dict
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple, Optional, Union, Dict, NamedTuple, Iterator
 
 SKIP_MAX = 1_000_000
 CALL = 50
@@ -26,6 +30,72 @@ NameFunction = 5
 ModuleFunction = 8
 PathFunction = 10
 
+DECISION_CACHE_MAX = 65536
+INFO_CACHE_MAX = 65536
+
+MODULE_LIST_CACHE: Dict[str, List[str]] = {}
+FILE_PATH_CACHE: Dict[str, pathlib.Path] = {}
+INFO_CACHE: Dict[tuple, Tuple[types.CodeType, str]] = {}
+BACKGROUND_EXECUTOR: Optional[ThreadPoolExecutor] = None
+BACKGROUND_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_background_executor() -> ThreadPoolExecutor:
+    """
+    STACK的后台任务共用的单线程执行器，第一次使用时才创建
+    """
+    global BACKGROUND_EXECUTOR
+    with BACKGROUND_EXECUTOR_LOCK:
+        if BACKGROUND_EXECUTOR is None:
+            BACKGROUND_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='movoid_stack')
+    return BACKGROUND_EXECUTOR
+
+
+def get_file_lines(file_path, encoding='utf8') -> List[str]:
+    """
+    读取文件的所有行。utf8编码的文件通过linecache读取，和traceback共用缓存
+    :param file_path: 文件路径
+    :param encoding: 文件编码
+    :return: 所有行的列表
+    """
+    file_name = str(file_path)
+    if encoding.replace('-', '').lower() == 'utf8':
+        linecache.checkcache(file_name)
+        return linecache.getlines(file_name)
+    with open(file_name, 'r', encoding=encoding) as f:
+        return f.readlines()
+
+
+def get_line_text(lines: List[str], lineno: int) -> str:
+    return lines[lineno - 1].strip() if 0 < lineno <= len(lines) else ''
+
+
+class FrameSnapshot(NamedTuple):
+    """
+    栈的快照，只记录module、行号和code，不引用frame本身，所以不会让整条调用链的局部变量一直存活
+    适合放在队列里之后再处理，info的格式化可以延迟到需要的时候，或者通过Stack.format_snapshots放到后台线程中
+    """
+    module: str
+    lineno: int
+    code: types.CodeType
+
+    @classmethod
+    def from_frame(cls, frame: types.FrameType) -> 'FrameSnapshot':
+        code = frame.f_code
+        module = '<string>' if code.co_filename == '<string>' else frame.f_globals.get('__name__', '__unknown__')
+        return cls(module, frame.f_lineno, code)
+
+    @property
+    def func_name(self) -> str:
+        return self.code.co_name
+
+    def to_stack_frame(self, level=DECORATOR) -> 'StackFrame':
+        return StackFrame(self, level)
+
+    def info(self, info_style=ModuleFunction) -> str:
+        cache = INFO_CACHE.get((id(self.code), self.lineno, self.module, info_style))
+        return StackFrame(self).info(info_style) if cache is None else cache[1]
+
 
 class StackFrame:
     """
@@ -37,11 +107,15 @@ class StackFrame:
     3、记录
     """
 
+    __slots__ = ('_frame', '_code', '_module', '_module_list_value', '_file_name', '_file_path_value', '_file_str', '_lineno', '_func_name', '_level', 'self_check_str', 'encoding')
+
     def __init__(self, frame, level=DECORATOR, self_check_str='', encoding='utf8'):
         self._frame: Optional[types.FrameType] = None
+        self._code: Optional[types.CodeType] = None
         self._module: str = '__unknown__'
-        self._module_list: List[str] = []
-        self._file_path: Optional[pathlib.Path] = None
+        self._module_list_value: Optional[List[str]] = None
+        self._file_name: Optional[str] = None
+        self._file_path_value: Optional[pathlib.Path] = None
         self._file_str: str = ''
         self._lineno: Optional[int] = None
         self._func_name: str = ''
@@ -53,52 +127,51 @@ class StackFrame:
             raise TypeError(f'level:{level}({type(level).__name__}) must be int')
         if isinstance(frame, StackFrame):
             self._frame = frame._frame
+            self._code = frame._code
             self._module = frame._module
-            self._module_list = frame._module_list
-            self._file_path = frame._file_path
+            self._module_list_value = frame._module_list_value
+            self._file_name = frame._file_name
+            self._file_path_value = frame._file_path_value
             self._file_str = frame._file_str
             self._lineno = frame._lineno
             self._func_name = frame._func_name
-        elif inspect.isframe(frame):
+        elif isinstance(frame, FrameSnapshot):
+            self._code = frame.code
+            self._module = frame.module
+            self._file_name = frame.code.co_filename
+            if self._file_name == '<string>':
+                self._file_str = self._file_name
+            self._lineno = frame.lineno
+            self._func_name = frame.code.co_name
+        elif isinstance(frame, types.FrameType):
             self._frame = frame
-            if '__name__' in frame.f_globals:
-                self._module = frame.f_globals.get('__name__', '__unknown__')
-            else:
-                self._module = '__unknown__'
-            try:
-                if frame.f_code.co_filename == '<string>':
-                    self._file_str = frame.f_code.co_filename
-                    self._module = '<string>'
-                self._file_path = pathlib.Path(frame.f_code.co_filename).absolute().resolve()
-            except:
-                self._file_path = frame.f_globals.get('__file__', None)
-            self._module_list = self._module.split('.')
+            self._module = frame.f_globals.get('__name__', '__unknown__')
+            code = frame.f_code
+            self._code = code
+            if code.co_filename == '<string>':
+                self._file_str = code.co_filename
+                self._module = '<string>'
+            self._file_name = code.co_filename
             self._lineno = frame.f_lineno
-            self._func_name = frame.f_code.co_name
+            self._func_name = code.co_name
         elif inspect.ismodule(frame):
-            self._file_path = pathlib.Path(frame.__file__).absolute().resolve()
+            self._file_name = frame.__file__
             self._module = frame.__name__
-            self._module_list = self._module.split('.')
         elif isinstance(frame, (tuple, list)):
             if 1 <= len(frame) <= 3:
                 module = frame[0]
                 if inspect.isframe(module):
                     self._frame = module
-                    if '__name__' in module.f_globals:
-                        self._module = module.f_globals.get('__name__', '__unknown__')
-                    else:
-                        self._module = '__unknown__'
-                    self._module_list = self._module.split('.')
-                    self._file_path = pathlib.Path(module.f_code.co_filename).absolute().resolve()
+                    self._code = module.f_code
+                    self._module = module.f_globals.get('__name__', '__unknown__')
+                    self._file_name = module.f_code.co_filename
                     self._lineno = module.f_lineno
                     self._func_name = module.f_code.co_name
                 elif isinstance(module, str):
                     self._module = module
-                    self._module_list = self._module.split('.')
                 elif inspect.ismodule(frame):
-                    self._file_path = pathlib.Path(frame.__file__).absolute().resolve()
+                    self._file_name = frame.__file__
                     self._module = frame.__name__
-                    self._module_list = self._module.split('.')
                 else:
                     raise ValueError(f'module {module}({type(module).__name__}) should be module or str')
                 if len(frame) >= 2:
@@ -108,7 +181,62 @@ class StackFrame:
         else:
             raise TypeError(f'frame:{frame}({type(frame).__name__}) can not be parsed')
 
+    @property
+    def _module_list(self) -> List[str]:
+        """
+        module按照.拆分后的列表，第一次使用时才计算，相同module共用同一个列表
+        """
+        if self._module_list_value is None:
+            module_list = MODULE_LIST_CACHE.get(self._module)
+            if module_list is None:
+                module_list = self._module.split('.')
+                MODULE_LIST_CACHE[self._module] = module_list
+            self._module_list_value = module_list
+        return self._module_list_value
+
+    @_module_list.setter
+    def _module_list(self, value):
+        self._module_list_value = value
+
+    @property
+    def _file_path(self) -> Optional[pathlib.Path]:
+        """
+        文件的绝对路径，第一次使用时才解析，同一个文件名只会访问一次文件系统
+        """
+        if self._file_path_value is None and self._file_name is not None:
+            file_path = FILE_PATH_CACHE.get(self._file_name)
+            if file_path is None:
+                try:
+                    file_path = pathlib.Path(self._file_name).absolute().resolve()
+                except Exception:
+                    return None if self._frame is None else self._frame.f_globals.get('__file__', None)
+                FILE_PATH_CACHE[self._file_name] = file_path
+            self._file_path_value = file_path
+        return self._file_path_value
+
+    @_file_path.setter
+    def _file_path(self, value):
+        self._file_path_value = value
+
     def info(self, info_style=ModuleFunction):
+        """
+        格式化的栈信息。来自frame的栈会按照(code, 行号, module, 格式)缓存结果，同一个调用位置只会格式化一次
+        缓存中同时保存code本身，保证作为key的id不会被其他code复用
+        :param info_style: 格式
+        :return: 文本
+        """
+        if self._code is None:
+            return self._format_info(info_style)
+        key = (id(self._code), self._lineno, self._module, info_style)
+        cache = INFO_CACHE.get(key)
+        if cache is None:
+            if len(INFO_CACHE) >= INFO_CACHE_MAX:
+                INFO_CACHE.clear()
+            cache = (self._code, self._format_info(info_style))
+            INFO_CACHE[key] = cache
+        return cache[1]
+
+    def _format_info(self, info_style=ModuleFunction):
         if info_style == ModuleFunction:
             return f'{self._module}{self.lineno_str}:{self._func_name}'
         elif info_style == NameFunction:
@@ -223,19 +351,102 @@ class StackFrame:
 
     def self_check(self):
         if self._file_path is not None and self._lineno is not None and self.self_check_str:
-            with self._file_path.open('r', encoding=self.encoding) as f:
-                for i in range(self._lineno - 1):
-                    f.readline()
-                target_str = f.readline().strip()
+            target_str = get_line_text(get_file_lines(self._file_path, self.encoding), self._lineno)
             assert target_str == self.self_check_str, f'{target_str} != {self.self_check_str}, please check {self._file_path}:{self._lineno} first.'
 
 
+class IgnoreRegistry:
+    """
+    跳过规则的一个不可变快照，以及根据它编译出的索引和判定缓存
+    规则每次变化都会生成新的快照并整体替换，读取时不需要加锁，旧快照的缓存随着旧快照一起失效
+    """
+    __slots__ = ('version', 'ignore_dict', 'module_index', 'decision_cache')
+
+    def __init__(self, version: int, ignore_dict: Dict[str, Dict[Optional[int], Tuple[int, pathlib.Path, str, str]]]):
+        self.version = version
+        self.ignore_dict = ignore_dict
+        self.module_index: Dict[str, Tuple[Dict[int, int], Optional[int]]] = {}
+        self.decision_cache: Dict[Tuple[int, int], Tuple[types.CodeType, Optional[int]]] = {}
+
+
 class Stack:
     ignore_dict: Dict[str, Dict[Optional[int], Tuple[int, pathlib.Path, str, str]]] = {}
+    _registry = IgnoreRegistry(0, ignore_dict)
+    _registry_lock = threading.Lock()
+    ignore_code_dict: Dict[int, Tuple[weakref.ref, int]] = {}
 
     def __init__(self):
         pass
 
+    @property
+    def version(self) -> int:
+        """
+        跳过规则的版本号，每次规则变化都会增加
+        """
+        return Stack._registry.version
+
+    def _publish(self, ignore_dict):
+        """
+        发布新的规则快照，需要在_registry_lock中调用。ignore_dict发布之后不能再修改
+        """
+        Stack.ignore_dict = ignore_dict
+        Stack._registry = IgnoreRegistry(Stack._registry.version + 1, ignore_dict)
+
+    def _get_module_index(self, module: str, registry: IgnoreRegistry) -> Tuple[Dict[int, int], Optional[int]]:
+        """
+        把规则快照中和这个module相关的规则编译为索引
+        :param module: module名
+        :param registry: 规则快照
+        :return: ({行号: 跳过等级}, 整个module的跳过等级)，module的跳过等级来自于最近的一个有整体规则的父module
+        """
+        module_index = registry.module_index.get(module)
+        if module_index is None:
+            ignore_dict = registry.ignore_dict
+            lineno_dict = {i: v[0] for i, v in ignore_dict.get(module, {}).items() if i is not None}
+            module_level = None
+            module_list = module.split('.')
+            for i in range(len(module_list), 0, -1):
+                ignore_dict2 = ignore_dict.get('.'.join(module_list[:i]))
+                if ignore_dict2 is not None and None in ignore_dict2:
+                    module_level = ignore_dict2[None][0]
+                    break
+            module_index = (lineno_dict, module_level)
+            registry.module_index[module] = module_index
+        return module_index
+
+    def _get_ignore_level(self, module: str, lineno: Optional[int], registry: Optional[IgnoreRegistry] = None) -> Optional[int]:
+        """
+        :return: 这一行需要跳过的最低等级，None为不需要跳过
+        """
+        lineno_dict, module_level = self._get_module_index(module, Stack._registry if registry is None else registry)
+        return lineno_dict.get(lineno, module_level)
+
+    def _frame_ignore_level(self, frame: types.FrameType) -> Optional[int]:
+        """
+        直接根据frame判断跳过等级，不需要创建StackFrame
+        结果按照(id(code), 行号)缓存在当前的规则快照中，缓存中同时保存code本身，保证id不会被其他code复用
+        """
+        code = frame.f_code
+        code_info = Stack.ignore_code_dict.get(id(code))
+        if code_info is not None:
+            return code_info[1]
+        registry = Stack._registry
+        key = (id(code), frame.f_lineno)
+        cache = registry.decision_cache
+        decision = cache.get(key)
+        if decision is not None:
+            return decision[1]
+        module = '<string>' if code.co_filename == '<string>' else frame.f_globals.get('__name__', '__unknown__')
+        ignore_level = self._get_ignore_level(module, frame.f_lineno, registry)
+        if len(cache) >= DECISION_CACHE_MAX:
+            cache.clear()
+        cache[key] = (code, ignore_level)
+        return ignore_level
+
+    def _frame_should_ignore(self, frame: types.FrameType, level: int) -> bool:
+        ignore_level = self._frame_ignore_level(frame)
+        return ignore_level is not None and level >= ignore_level
+
     @property
     def stack_frame(self) -> StackFrame:
         return self.get_frame(1)
@@ -270,16 +481,42 @@ class Stack:
         :param add_it:
         :return:
         """
-        match_bool = stack_frame.match_ignore_dict(self.ignore_dict)
-        if match_bool:
+        code_info = None if stack_frame._frame is None else self.ignore_code_dict.get(id(stack_frame._frame.f_code))
+        ignore_level = self._get_ignore_level(stack_frame._module, stack_frame._lineno) if code_info is None else code_info[1]
+        if ignore_level is not None and stack_frame._level >= ignore_level:
             return True
         if add_it:
             if stack_frame._module in ('__main__', '__unknown__'):
                 raise ValueError(f'please do not add __main__ or unknown module to ignore dict')
-            self.ignore_dict.setdefault(stack_frame._module, {})
-            self.ignore_dict[stack_frame._module].setdefault(stack_frame._lineno, (stack_frame._level, stack_frame._file_path, stack_frame.self_check_str, stack_frame.encoding))
+            lineno_info = (stack_frame._level, stack_frame._file_path, stack_frame.self_check_str, stack_frame.encoding)
+            with Stack._registry_lock:
+                module_dict = Stack.ignore_dict.get(stack_frame._module, {})
+                if stack_frame._lineno not in module_dict:
+                    ignore_dict = dict(Stack.ignore_dict)
+                    ignore_dict[stack_frame._module] = {**module_dict, stack_frame._lineno: lineno_info}
+                    self._publish(ignore_dict)
         return False
 
+    def remove_ignore(self, module: str, lineno: Optional[int] = None) -> bool:
+        """
+        删除一条按module或行号跳过的规则
+        :param module: module名
+        :param lineno: 行号，None为整个module的规则
+        :return: 是否删除成功
+        """
+        with Stack._registry_lock:
+            module_dict = Stack.ignore_dict.get(module)
+            if module_dict is None or lineno not in module_dict:
+                return False
+            ignore_dict = dict(Stack.ignore_dict)
+            module_dict = {i: v for i, v in module_dict.items() if i != lineno}
+            if module_dict:
+                ignore_dict[module] = module_dict
+            else:
+                ignore_dict.pop(module)
+            self._publish(ignore_dict)
+        return True
+
     def this_file_lineno_should_ignore(self, lineno: int, ignore_level: int = DECORATOR, check_text: str = '', encoding: str = 'utf8'):
         stack_frame = self.get_frame(1, skip_ignore_level=NO_SKIP)
         stack_frame._lineno = None if lineno is None else int(lineno)
@@ -288,46 +525,126 @@ class Stack:
         stack_frame.encoding = encoding
         self.should_ignore(stack_frame, add_it=True)
 
+    def ignore_function(self, func=None, ignore_level: int = DECORATOR):
+        """
+        把函数的整个code标记为需要跳过，不需要记录行号，栈中所有执行这个code的frame都会被跳过
+        可以直接调用，也可以作为装饰器使用：@STACK.ignore_function 或 @STACK.ignore_function(ignore_level=UI)
+        code被回收后，记录会自动删除
+        :param func: 函数、方法或code
+        :param ignore_level: 跳过的等级
+        :return: 原样返回func
+        """
+        if func is None:
+            return lambda _: self.ignore_function(_, ignore_level=ignore_level)
+        if isinstance(func, types.CodeType):
+            code = func
+        elif isinstance(getattr(func, '__func__', None), types.FunctionType):
+            code = func.__func__.__code__
+        elif isinstance(getattr(func, '__code__', None), types.CodeType):
+            code = func.__code__
+        else:
+            raise TypeError(f'{func}({type(func).__name__}) has no code to ignore')
+        key = id(code)
+        code_info = self.ignore_code_dict.get(key)
+        if code_info is None:
+            code_ref = weakref.ref(code, lambda _: Stack.ignore_code_dict.pop(key, None))
+        else:
+            code_ref = code_info[0]
+        self.ignore_code_dict[key] = (code_ref, int(ignore_level))
+        return func
+
     def module_should_ignore(self, module, ignore_level: int = DECORATOR):
         self.should_ignore(StackFrame(module, level=ignore_level), add_it=True)
 
-    def get_frame(self, stacklevel=None, skip_ignore_level=DECORATOR, with_stack_level=False, from_error=False) -> Union[StackFrame, Tuple[StackFrame, int]]:
+    def _walk_back(self, frame: types.FrameType, stacklevel: int, skip_ignore_level: int) -> Tuple[types.FrameType, int]:
+        """
+        从frame开始回退stacklevel个不需要跳过的栈
+        :return: (目标frame, 实际回退的frame数量)
+        """
+        stack_index = 0
+        for f_index in range(stacklevel):
+            frame = frame.f_back
+            stack_index += 1
+            if frame is None:
+                raise ValueError('frame back to None')
+            while self._frame_should_ignore(frame, skip_ignore_level):
+                frame = frame.f_back
+                stack_index += 1
+                if frame is None:
+                    raise ValueError('frame back to None')
+        return frame, stack_index
+
+    def get_frame(self, stacklevel=None, skip_ignore_level=DECORATOR, with_stack_level=False, from_error=False, snapshot=False) -> Union[StackFrame, FrameSnapshot, Tuple[Union[StackFrame, FrameSnapshot], int]]:
         """
         获取回退一定level后的栈的信息
         :param stacklevel: 后退栈的数量
         :param skip_ignore_level: 根据level来跳过ignore的list
         :param with_stack_level: 返回值中是否包含相对于上一级的stack level
         :param from_error: 是否需要考虑error状态下的traceback的追溯
+        :param snapshot: 是否返回不引用frame的FrameSnapshot
         :return: 目标栈
         """
         if from_error:
             last_traceback = sys.exc_info()[-1]
             while last_traceback.tb_next:
                 last_traceback = last_traceback.tb_next
-            target_frame = last_traceback.tb_frame
+            frame = last_traceback.tb_frame
         else:
-            target_frame = sys._getframe()
-        stack_frame = StackFrame(target_frame, skip_ignore_level)
-        stack_index = 0
+            frame = sys._getframe()
         stacklevel = 0 if stacklevel is None else stacklevel
         stacklevel = stacklevel if from_error else stacklevel + 1
-        for f_index in range(stacklevel):
-            stack_frame = stack_frame.f_back
-            stack_index += 1
-            if stack_frame is None:
-                raise ValueError('frame back to None')
-            while True:
-                if self.should_ignore(stack_frame):
-                    stack_frame = stack_frame.f_back
-                    stack_index += 1
-                    if stack_frame is None:
-                        raise ValueError('frame back to None')
-                else:
-                    break
+        frame, stack_index = self._walk_back(frame, stacklevel, skip_ignore_level)
+        stack_frame = FrameSnapshot.from_frame(frame) if snapshot else StackFrame(frame, skip_ignore_level)
         re_value = (stack_frame, stack_index) if with_stack_level else stack_frame
         return re_value
 
-    def get_frame_list(self, stacklevel=None, init_ignore_level=NO_SKIP, skip_ignore_level=DECORATOR, with_stack_level=False, from_error=False) -> List[Union[StackFrame, Tuple[StackFrame, int]]]:
+    def iter_frames(self, stacklevel=None, init_ignore_level=NO_SKIP, skip_ignore_level=DECORATOR, with_stack_level=False, from_error=False,
+                    snapshot=False, max_frames=None, stop_module=None) -> Iterator[Union[StackFrame, FrameSnapshot, Tuple[Union[StackFrame, FrameSnapshot], int]]]:
+        """
+        逐个获取自己之前的栈，参数和get_frame_list一致。只在迭代时才继续回溯，可以随时停止
+        :param stacklevel: 是否需要额外再回退若干栈
+        :param init_ignore_level: 初始跳过stack level的时候
+        :param skip_ignore_level: 是否要跳过那些需要ignore的栈
+        :param with_stack_level: 是否在返回的内容里包含stack index信息
+        :param from_error: 是否需要考虑error状态下的traceback的追溯
+        :param snapshot: 是否返回不引用frame的FrameSnapshot
+        :param max_frames: 最多返回多少个栈，默认不限制
+        :param stop_module: 遇到这个module（或者其中的任意一个，包括子module）的栈时停止，这个栈本身不返回
+        :return: 栈的迭代器
+        """
+        if from_error:
+            last_traceback = sys.exc_info()[-1]
+            while last_traceback.tb_next:
+                last_traceback = last_traceback.tb_next
+            frame = last_traceback.tb_frame
+        else:
+            frame = sys._getframe()
+        stacklevel = 0 if stacklevel is None else stacklevel
+        stacklevel = stacklevel if from_error else stacklevel + 1
+        frame = self._walk_back(frame, stacklevel, init_ignore_level)[0]
+        if stop_module is not None:
+            stop_module = (stop_module,) if isinstance(stop_module, str) else tuple(stop_module)
+        return self._iter_frames(frame, skip_ignore_level, with_stack_level, snapshot, max_frames, stop_module)
+
+    def _iter_frames(self, frame, skip_ignore_level, with_stack_level, snapshot, max_frames, stop_module):
+        index = 0
+        count = 0
+        while frame is not None:
+            if max_frames is not None and count >= max_frames:
+                return
+            if stop_module is not None:
+                module = frame.f_globals.get('__name__', '__unknown__')
+                if any(module == _ or module.startswith(_ + '.') for _ in stop_module):
+                    return
+            if not self._frame_should_ignore(frame, skip_ignore_level):
+                stack_frame = FrameSnapshot.from_frame(frame) if snapshot else StackFrame(frame, skip_ignore_level)
+                yield (stack_frame, index) if with_stack_level else stack_frame
+                count += 1
+            index += 1
+            frame = frame.f_back
+
+    def get_frame_list(self, stacklevel=None, init_ignore_level=NO_SKIP, skip_ignore_level=DECORATOR, with_stack_level=False, from_error=False,
+                       snapshot=False, max_frames=None, stop_module=None) -> List[Union[StackFrame, FrameSnapshot, Tuple[Union[StackFrame, FrameSnapshot], int]]]:
         """
         获取自己的所有的之前的栈的frame的列表
         :param stacklevel: 是否需要额外再回退若干栈
@@ -335,37 +652,49 @@ class Stack:
         :param skip_ignore_level: 是否要跳过那些需要ignore的栈
         :param with_stack_level: 是否在返回的列表里包含stack index信息
         :param from_error: 是否需要考虑error状态下的traceback的追溯
+        :param snapshot: 是否返回不引用frame的FrameSnapshot
+        :param max_frames: 最多返回多少个栈，默认不限制
+        :param stop_module: 遇到这个module（或者其中的任意一个，包括子module）的栈时停止，这个栈本身不返回
         :return: 全部栈列表[(栈，回追的栈序号)] / [栈]
         """
         stacklevel = 0 if stacklevel is None else stacklevel
         stacklevel = stacklevel if from_error else stacklevel + 1
-        stack_frame = self.get_frame(stacklevel=stacklevel, skip_ignore_level=init_ignore_level, from_error=from_error)
-        stack_frame._level = skip_ignore_level
-        re_list = []
-        index = 0
-        while stack_frame is not None:
-            if self.should_ignore(stack_frame):
-                stack_frame = stack_frame.f_back
-                index += 1
-                continue
-            else:
-                re_list.append((stack_frame, index) if with_stack_level else stack_frame)
-                index += 1
-                stack_frame = stack_frame.f_back
-        return re_list
+        return list(self.iter_frames(stacklevel, init_ignore_level, skip_ignore_level, with_stack_level, from_error, snapshot, max_frames, stop_module))
 
-    def self_check(self):
-        for module, module_info in self.ignore_dict.items():
-            for lineno, lineno_info in self.ignore_dict[module].items():
+    def format_snapshots(self, snapshot_list, info_style=ModuleFunction) -> Future:
+        """
+        在后台线程中把一组FrameSnapshot格式化为info文本
+        :param snapshot_list: FrameSnapshot的列表
+        :param info_style: info的格式
+        :return: Future，结果为文本的列表
+        """
+        return get_background_executor().submit(lambda: [_.info(info_style) for _ in snapshot_list])
+
+    def self_check(self, background=False) -> Optional[Future]:
+        """
+        检查所有按行号跳过的规则，对应的行是否还是注册时的文本
+        按照文件分组，每个文件只读取一次，所有规则检查完毕后一起报告
+        :param background: 是否在后台线程中检查，是的话返回Future，结果通过Future.result()获取，检查失败时会抛出AssertionError
+        :return: 后台检查时为Future，否则为None
+        """
+        if background:
+            return get_background_executor().submit(self.self_check)
+        file_dict: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for module, module_info in list(self.ignore_dict.items()):
+            for lineno, lineno_info in list(module_info.items()):
                 if lineno is None:
                     continue
                 level, file_path, self_check_str, encoding = lineno_info
                 if file_path is not None and self_check_str:
-                    with file_path.open('r', encoding=encoding) as f:
-                        for i in range(lineno - 1):
-                            f.readline()
-                        target_str = f.readline().strip()
-                    assert target_str == self_check_str, f'{target_str} != {self_check_str}, please check {file_path}:{lineno} first.'
+                    file_dict.setdefault((str(file_path), encoding), []).append((lineno, self_check_str))
+        error_list = []
+        for (file_path, encoding), check_list in file_dict.items():
+            lines = get_file_lines(file_path, encoding)
+            for lineno, self_check_str in check_list:
+                target_str = get_line_text(lines, lineno)
+                if target_str != self_check_str:
+                    error_list.append(f'{target_str} != {self_check_str}, please check {file_path}:{lineno} first.')
+        assert not error_list, '\n'.join(error_list)
 
 
 STACK = Stack()
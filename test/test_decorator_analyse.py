@@ -6,7 +6,11 @@
 # Time          : 2025/2/16 18:18
 # Description   : 
 """
-from movoid_function import analyse_args_kw_value_from_function
+import gc
+from concurrent.futures import ThreadPoolExecutor
+
+from movoid_function import analyse_args_kw_value_from_function, get_parameter_kind_list_from_function, SIGNATURE_CACHE, \
+    adapt_call, adapt_map, BINDING_PLAN_CACHE
 
 
 def target1(a, /, b, c, d=4, e=5, *, f=6, g=7):
@@ -41,3 +45,138 @@ class Test_function_analyse_args_kw_value_from_function:
             print(err)
         else:
             raise AssertionError('传入的参数数量过少，没有报错')
+
+
+class Test_class_SignatureCache:
+    def test_01_hit_and_miss(self):
+        def target(a, b=1, *, c=2):
+            return a, b, c
+
+        hits = SIGNATURE_CACHE.hits
+        misses = SIGNATURE_CACHE.misses
+        first = get_parameter_kind_list_from_function(target)
+        second = get_parameter_kind_list_from_function(target)
+        assert first == second
+        assert SIGNATURE_CACHE.misses == misses + 1
+        assert SIGNATURE_CACHE.hits == hits + 1
+        target.__defaults__ = (5,)
+        assert get_parameter_kind_list_from_function(target)[1][1].default == 5
+        assert SIGNATURE_CACHE.misses == misses + 2
+
+    def test_02_evict_with_code(self):
+        namespace = {}
+        exec('def temp(a, b):\n    return a', namespace)
+        get_parameter_kind_list_from_function(namespace['temp'])
+        size = SIGNATURE_CACHE.info()['size']
+        namespace.clear()
+        gc.collect()
+        assert SIGNATURE_CACHE.info()['size'] == size - 1
+
+    def test_03_max_size(self):
+        namespace = {}
+        for index in range(8):
+            exec(f'def temp_{index}(a, b={index}):\n    return a', namespace)
+        max_size = SIGNATURE_CACHE.max_size
+        SIGNATURE_CACHE.max_size = 4
+        try:
+            SIGNATURE_CACHE.clear()
+            for index in range(8):
+                get_parameter_kind_list_from_function(namespace[f'temp_{index}'])
+            get_parameter_kind_list_from_function(namespace['temp_4'])
+            get_parameter_kind_list_from_function(namespace['temp_0'])
+            assert SIGNATURE_CACHE.info()['size'] == 4
+            misses = SIGNATURE_CACHE.misses
+            get_parameter_kind_list_from_function(namespace['temp_4'])
+            assert SIGNATURE_CACHE.misses == misses
+        finally:
+            SIGNATURE_CACHE.max_size = max_size
+
+
+def target_adapt(a, b, c=3, *args, d, e=5, **kwargs):
+    return a, b, c, args, d, e, kwargs
+
+
+def other_adapt(b, d, f=6):
+    return b, d, f
+
+
+class Test_function_adapt_call:
+    def test_01_basic(self):
+        assert adapt_call(target_adapt, [1, 2], {'d': 4, 'z': 0}) == (1, 2, 3, (), 4, 5, {'z': 0})
+        assert adapt_call(target_adapt, [1, 2, 7, 8], {'d': 4}) == (1, 2, 7, (8,), 4, 5, {})
+        assert adapt_call(target_adapt, [1], {'b': 2, 'd': 4}) == (1, 2, 3, (), 4, 5, {})
+
+    def test_02_other_function(self):
+        assert adapt_call(target_adapt, [1], {}, other_adapt, [20, 40]) == (1, 20, 3, (), 40, 5, {})
+        assert adapt_call(target_adapt, [1], {}, other_adapt, [20, 40], force=True) == (1, 20, 3, (), 40, 5, {})
+        assert adapt_call(target_adapt, [1, 2], {'d': 4}, other_adapt, [20]) == (1, 2, 3, (), 4, 5, {})
+
+    def test_03_plan_reused(self):
+        adapt_call(target_adapt, [1, 2], {'d': 4})
+        hits = BINDING_PLAN_CACHE.hits
+        misses = BINDING_PLAN_CACHE.misses
+        for i in range(10):
+            assert adapt_call(target_adapt, [i, 2], {'d': i}) == (i, 2, 3, (), i, 5, {})
+        assert BINDING_PLAN_CACHE.hits == hits + 10
+        assert BINDING_PLAN_CACHE.misses == misses
+
+    def test_04_self_from_other_function(self):
+        class Temp:
+            def method(self, x):
+                return x
+
+        def target(self, x):
+            return self, x
+
+        temp = Temp()
+        assert adapt_call(target, [1], {}, temp.method, [1]) == (temp, 1)
+        assert adapt_call(target, [temp, 1], {}, temp.method, [1]) == (temp, 1)
+
+    def test_05_defaults_changed(self):
+        def target(a, b=1, *, c=2):
+            return a, b, c
+
+        assert adapt_call(target, [0]) == (0, 1, 2)
+        target.__defaults__ = (3,)
+        target.__kwdefaults__ = {'c': 4}
+        assert adapt_call(target, [0]) == (0, 3, 4)
+
+    def test_06_bound_self_not_kept(self):
+        import weakref
+
+        class Temp:
+            def method(self, x, y=1):
+                return x + y
+
+        temp = Temp()
+        temp_ref = weakref.ref(temp)
+        assert adapt_call(temp.method, [1]) == 2
+        other = Temp()
+        misses = BINDING_PLAN_CACHE.misses
+        assert adapt_call(other.method, [2]) == 3
+        assert BINDING_PLAN_CACHE.misses == misses
+        del temp
+        gc.collect()
+        assert temp_ref() is None
+
+
+class Test_function_adapt_map:
+    rows = [((i,), {'b': i * 2, 'd': i, 'z': i}) if i % 2 else ((i, i, i), {'d': i}) for i in range(20)]
+
+    def test_01_generator(self):
+        result = adapt_map(target_adapt, self.rows)
+        assert not isinstance(result, list)
+        assert list(result) == [adapt_call(target_adapt, *_) for _ in self.rows]
+
+    def test_02_plan_shared(self):
+        list(adapt_map(target_adapt, self.rows))
+        misses = BINDING_PLAN_CACHE.misses
+        hits = BINDING_PLAN_CACHE.hits
+        list(adapt_map(target_adapt, self.rows))
+        assert BINDING_PLAN_CACHE.misses == misses
+        assert BINDING_PLAN_CACHE.hits == hits + 2
+
+    def test_03_executor(self):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            result = list(adapt_map(target_adapt, self.rows, other_adapt, [0, 0], executor=executor, chunksize=3))
+        assert result == [adapt_call(target_adapt, *_) for _ in self.rows]
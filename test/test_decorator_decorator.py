@@ -6,7 +6,19 @@
 # Time          : 2024/8/22 22:40
 # Description   : 
 """
-from movoid_function import wraps, decorate_class_function_include, decorate_class_function_exclude
+import asyncio
+import inspect
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from inspect import Signature
+from types import FunctionType, ModuleType
+
+import pytest
+from movoid_function import wraps, wraps_kw, wraps_func, wraps_ori, wraps_add_one, wraps_add_multi, reset_function_default_value, \
+    decorate_class_function_include, decorate_class_function_exclude
+from movoid_function.decorator import WRAPS_CONFIG, LazyFunction, create_function_with_parameters_function_args, COMPACT_SIGNATURE_DICT, COMPACT_SIGNATURE_MAX_SIZE
 
 
 def dec(func):
@@ -146,3 +158,450 @@ class Test_function_decorate_class_function_exclude:
         assert test1.static_do() == 2
         assert Test1.class_do() == 'class'
         assert Test1.static_do() == 2
+
+
+def target_wraps(a, b=2, *args, c=3, **kwargs):
+    return a, b, args, c, kwargs
+
+
+class Test_function_wraps:
+    def test_01_signature_and_call(self):
+        wrapped = dec2(None)(target_wraps)
+        assert str(inspect.signature(wrapped)) == '(a, b=2, *args, c=3, **kwargs)'
+        assert wrapped.__name__ == 'target_wraps'
+
+        def pass_through(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(*args, **kwargs)
+
+            return wrapper
+
+        wrapped = pass_through(target_wraps)
+        assert wrapped(1) == (1, 2, (), 3, {})
+        assert wrapped(1, 5, 6, 7, c=8, d=9) == (1, 5, (6, 7), 8, {'d': 9})
+
+    def test_02_parameter_named_func(self):
+        def target(func, x=1):
+            return func, x
+
+        assert dec2(None)(target)(1) is None
+
+        @wraps(target)
+        def wrapper(*args, **kwargs):
+            return args, kwargs
+
+        assert wrapper(5, x=6) == ((5, 6), {})
+
+    def test_03_wraps_kw(self):
+        @wraps_kw(target_wraps)
+        def wrapper(**kwargs):
+            return kwargs
+
+        assert wrapper(1, 2, 3, c=4, d=5) == {'a': 1, 'b': 2, 'args': (3,), 'c': 4, 'd': 5}
+
+    def test_04_wraps_add_one(self):
+        @wraps_add_one('x', 1)
+        def target(a, *args, **kwargs):
+            return a, args, kwargs
+
+        assert str(inspect.signature(target)) == '(a, x: None = 1, *args, **kwargs)'
+        assert target(5) == (5, (1,), {})
+
+    def test_05_duplicate_parameter(self):
+        with pytest.raises(TypeError, match='duplicate argument'):
+            @wraps_add_one('a', 1)
+            def target(a, *args, **kwargs):
+                return a
+
+    def test_06_trampoline_code_cached(self):
+        def target_x(a, b=2, *args, c=3, **kwargs):
+            return a
+
+        def target_y(a, b=5, *args, c=7, **kwargs):
+            return b
+
+        wrapped_x = dec2(None)(target_x)
+        wrapped_y = dec2(None)(target_y)
+        assert wrapped_x.__code__ is not wrapped_y.__code__
+        assert wrapped_x.__code__.co_code == wrapped_y.__code__.co_code
+        assert (wrapped_x.__code__.co_name, wrapped_y.__code__.co_name) == ('target_x', 'target_y')
+        if sys.version_info >= (3, 11):
+            assert wrapped_x.__code__.co_qualname == target_x.__qualname__
+        wrapped = create_function_with_parameters_function_args(
+            list(inspect.signature(target_x).parameters.values()), Signature.empty, target_x,
+            {'arg': ['a', 'b'], 'args': 'args', 'kwarg': ['c'], 'kwargs': 'kwargs'}, None, 'target_x', None)
+        assert wrapped(1) == 1 and wrapped.__name__ == 'target_x'
+
+
+async def target_async(a, b=2):
+    await asyncio.sleep(0)
+    return a + b
+
+
+async def target_async_generator(n):
+    for i in range(n):
+        yield i
+
+
+class Test_function_wraps_async:
+    def test_01_coroutine(self):
+        def async_dec(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await func(*args, **kwargs) * 10
+
+            return wrapper
+
+        wrapped = async_dec(target_async)
+        assert inspect.iscoroutinefunction(wrapped)
+        assert asyncio.run(wrapped(1)) == 30
+
+    def test_02_sync_wrapper_of_coroutine(self):
+        def pass_through(func):
+            @wraps_kw(func)
+            def wrapper(**kwargs):
+                return func(**kwargs)
+
+            return wrapper
+
+        WRAPS_CONFIG.async_passthrough = True
+        try:
+            wrapped = dec(target_async)
+            wrapped_kw = pass_through(target_async)
+        finally:
+            WRAPS_CONFIG.async_passthrough = False
+        assert inspect.iscoroutinefunction(wrapped)
+        assert asyncio.run(wrapped(1, 2)) == 2
+        assert inspect.iscoroutinefunction(wrapped_kw)
+        assert asyncio.run(wrapped_kw(1, b=5)) == 6
+
+    def test_03_sync_adapter_of_coroutine(self):
+        def run_sync(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return asyncio.run(func(*args, **kwargs))
+
+            return wrapper
+
+        wrapped = run_sync(target_async)
+        assert not inspect.iscoroutinefunction(wrapped)
+        assert wrapped(1, b=5) == 6
+
+    def test_04_async_generator(self):
+        def async_generator_dec(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                async for value in func(*args, **kwargs):
+                    yield value * 10
+
+            return wrapper
+
+        wrapped = async_generator_dec(target_async_generator)
+        assert inspect.isasyncgenfunction(wrapped)
+
+        async def collect():
+            return [_ async for _ in wrapped(3)]
+
+        assert asyncio.run(collect()) == [0, 10, 20]
+
+    def test_05_async_generator_asend_athrow(self):
+        received = []
+
+        async def target_echo(n):
+            try:
+                for i in range(n):
+                    try:
+                        received.append((yield i))
+                    except ValueError as err:
+                        received.append(err.args[0])
+            finally:
+                received.append('closed')
+
+        async def drive(gen):
+            value_list = [await gen.asend(None), await gen.asend('a'), await gen.athrow(ValueError('b')), await gen.asend('c')]
+            await gen.aclose()
+            return value_list
+
+        for async_passthrough in (False, True):
+            WRAPS_CONFIG.async_passthrough = async_passthrough
+            try:
+                wrapped = pass_through_dec(target_echo)
+            finally:
+                WRAPS_CONFIG.async_passthrough = False
+            assert inspect.isasyncgenfunction(wrapped) is async_passthrough
+            received.clear()
+            assert asyncio.run(drive(wrapped(10))) == [0, 1, 2, 3]
+            assert received == ['a', 'b', 'c', 'closed']
+
+
+def target_fusion(a, b=2, *, c=3):
+    return a, b, c, sys._getframe(1)
+
+
+class Test_function_wraps_fusion:
+    def test_01_wraps_ori(self):
+        def ori_dec(func):
+            @wraps_ori(func)
+            def wrapper(*args, **kwargs):
+                pass
+
+            return wrapper
+
+        wrapped = ori_dec(ori_dec(ori_dec(target_fusion)))
+        a, b, c, caller = wrapped(1, c=4)
+        assert (a, b, c) == (1, 2, 4)
+        assert caller.f_back is sys._getframe()
+        assert str(inspect.signature(wrapped)) == '(a, b=2, *, c=3)'
+
+    def test_02_wraps_add_multi(self):
+        wrapped = wraps_add_multi(['x', 1])(wraps_add_multi(['y', 2])(target_fusion))
+        assert str(inspect.signature(wrapped)) == '(a, b=2, y: None = 2, x: None = 1, *, c=3)'
+        a, b, c, caller = wrapped(1, 5, 6, 7, c=8)
+        assert (a, b, c) == (1, 5, 8)
+        assert caller.f_back is sys._getframe()
+
+    def test_03_user_wrapper_not_fused(self):
+        wrapped = dec(dec(target_fusion))
+        assert wrapped(1, 2) == 3
+
+
+def target_signature(a, b: int = 2, /, c=3, *args: str, d, e: float = 5, **kwargs) -> int:
+    return a
+
+
+def signature_from_code(func):
+    signature = func.__dict__.pop('__signature__')
+    try:
+        return inspect.signature(func)
+    finally:
+        func.__signature__ = signature
+
+
+class Test_function_wraps_signature:
+    def test_01_wraps_family(self):
+        def ori_dec(func):
+            @wraps_ori(func)
+            def wrapper(z=1, *args, **kwargs):
+                pass
+
+            return wrapper
+
+        for wrapped in (
+                dec(target_signature),
+                ori_dec(target_signature),
+                wraps_add_one('q', 1)(target_signature),
+                wraps_add_multi(['q', 1], ['r', 2, inspect.Parameter.KEYWORD_ONLY])(target_signature),
+        ):
+            assert inspect.signature(wrapped) is wrapped.__signature__
+            assert wrapped.__signature__ == signature_from_code(wrapped)
+
+    def test_02_wraps_func_and_reset_default(self):
+        def target(x, y=1):
+            return x, y
+
+        @wraps_func(target, target_wraps)
+        def wrapper(kwargs, kw_target):
+            return kwargs, kw_target
+
+        assert wrapper.__signature__ == signature_from_code(wrapper)
+
+        @reset_function_default_value(target)
+        def reset(y=9):
+            pass
+
+        assert str(inspect.signature(reset)) == '(x, y=9)'
+        assert reset.__signature__ == signature_from_code(reset)
+        assert reset(1) == (1, 9)
+
+
+def pass_through_dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+@pass_through_dec
+def target_pickle(a, b=2):
+    return a * b
+
+
+class Test_function_wraps_pickle:
+    def test_01_pickle_by_name(self):
+        assert target_pickle.__module__ == __name__
+        assert target_pickle.__qualname__ == 'target_pickle'
+        assert pickle.loads(pickle.dumps(target_pickle)) is target_pickle
+
+    def test_02_process_pool(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            assert list(executor.map(target_pickle, [1, 2, 3])) == [2, 4, 6]
+
+
+class Test_function_wraps_compact:
+    def test_01_shared_code(self):
+        WRAPS_CONFIG.compact = True
+        try:
+            def target_a(a, b=2, *, c=3):
+                """doc a"""
+                return a + b + c
+
+            def target_b(a, b=5, *, c=7):
+                return a * b * c
+
+            wrapped_a = pass_through_dec(target_a)
+            wrapped_b = pass_through_dec(target_b)
+        finally:
+            WRAPS_CONFIG.compact = False
+        assert wrapped_a.__code__ is wrapped_b.__code__
+        assert wrapped_a.__globals__ is wrapped_b.__globals__
+        assert wrapped_a.__doc__ is target_a.__doc__
+        assert wrapped_a(1) == 6 and wrapped_b(1, c=2) == 10
+        assert wrapped_a.__name__ == 'target_a'
+        assert wrapped_a.__signature__ == signature_from_code(wrapped_a)
+        assert str(inspect.signature(wrapped_b)) == '(a, b=5, *, c=7)'
+
+    def test_02_async_and_signature_interned(self):
+        WRAPS_CONFIG.compact = True
+        WRAPS_CONFIG.async_passthrough = True
+        try:
+            async def target_c(a, b=2):
+                return a + b
+
+            async def target_d(a, b=2):
+                return a - b
+
+            wrapped_c = pass_through_dec(target_c)
+            wrapped_d = pass_through_dec(target_d)
+        finally:
+            WRAPS_CONFIG.compact = False
+            WRAPS_CONFIG.async_passthrough = False
+        assert inspect.iscoroutinefunction(wrapped_c)
+        assert asyncio.run(wrapped_c(1)) == 3 and asyncio.run(wrapped_d(5)) == 3
+        assert wrapped_c.__signature__ is wrapped_d.__signature__
+
+    def test_03_equal_defaults_not_merged(self):
+        WRAPS_CONFIG.compact = True
+        try:
+            def target_bool(a, b=True):
+                return b
+
+            def target_int(a, b=1):
+                return b
+
+            def target_float(a, b=1.0):
+                return b
+
+            wrapped_list = [pass_through_dec(_) for _ in (target_bool, target_int, target_float)]
+        finally:
+            WRAPS_CONFIG.compact = False
+        assert [str(inspect.signature(_)) for _ in wrapped_list] == ['(a, b=True)', '(a, b=1)', '(a, b=1.0)']
+        assert [_(0) for _ in wrapped_list] == [True, 1, 1.0]
+        assert COMPACT_SIGNATURE_DICT and len(COMPACT_SIGNATURE_DICT) <= COMPACT_SIGNATURE_MAX_SIZE
+
+
+lazy_module_source = """
+@pass_through_dec
+def target_lazy(a, b=2):
+    \"\"\"lazy doc\"\"\"
+    return a + b
+
+
+class TargetLazy:
+    @pass_through_dec
+    def method(self, a):
+        return a * 2
+"""
+
+
+def create_lazy_module(name):
+    module = ModuleType(name)
+    module.pass_through_dec = pass_through_dec
+    sys.modules[name] = module
+    WRAPS_CONFIG.lazy = True
+    try:
+        exec(lazy_module_source, module.__dict__)
+    finally:
+        WRAPS_CONFIG.lazy = False
+    return module
+
+
+class Test_function_wraps_lazy:
+    def test_01_replace_after_first_call(self):
+        module = create_lazy_module('lazy_module_01')
+        assert type(module.__dict__['target_lazy']) is LazyFunction
+        assert module.target_lazy.__name__ == 'target_lazy'
+        assert module.target_lazy(1) == 3
+        assert type(module.__dict__['target_lazy']) is FunctionType
+        assert str(inspect.signature(module.target_lazy)) == '(a, b=2)'
+        assert module.target_lazy.__doc__.startswith('lazy doc')
+
+    def test_02_method(self):
+        module = create_lazy_module('lazy_module_02')
+        assert type(module.TargetLazy.__dict__['method']) is LazyFunction
+        assert module.TargetLazy().method(3) == 6
+        assert type(module.TargetLazy.__dict__['method']) is FunctionType
+
+    def test_03_async_not_lazy(self):
+        WRAPS_CONFIG.lazy = True
+        WRAPS_CONFIG.async_passthrough = True
+        try:
+            async def target_async(a):
+                return a
+
+            wrapped = pass_through_dec(target_async)
+        finally:
+            WRAPS_CONFIG.lazy = False
+            WRAPS_CONFIG.async_passthrough = False
+        assert inspect.iscoroutinefunction(wrapped)
+
+    def test_04_stacked_layers_resolved(self):
+        stacked_source = lazy_module_source + """
+@pass_through_dec
+@pass_through_dec
+@pass_through_dec
+def target_stacked(a):
+    frame = sys._getframe()
+    depth = 0
+    while frame.f_code is not test_caller.__code__:
+        frame = frame.f_back
+        depth += 1
+    return depth
+
+
+def test_caller(a):
+    return target_stacked(a)
+"""
+        depth_list = []
+        for lazy in (False, True):
+            module = ModuleType(f'lazy_module_04_{lazy}')
+            module.pass_through_dec = pass_through_dec
+            module.sys = sys
+            sys.modules[module.__name__] = module
+            WRAPS_CONFIG.lazy = lazy
+            try:
+                exec(stacked_source, module.__dict__)
+            finally:
+                WRAPS_CONFIG.lazy = False
+            module.test_caller(1)
+            depth_list.append(module.test_caller(1))
+            assert not any(isinstance(_.cell_contents, LazyFunction) for _ in module.target_stacked.__closure__ or ())
+        assert depth_list[0] == depth_list[1]
+
+    def test_05_concurrent_first_call(self):
+        build_list = []
+
+        def target(a):
+            return a + 1
+
+        def build(run_func):
+            build_list.append(run_func)
+            time.sleep(0.05)
+            return run_func
+
+        lazy = LazyFunction(build, target, target)
+        with ThreadPoolExecutor(8) as executor:
+            result_list = list(executor.map(lazy, range(8)))
+        assert result_list == list(range(1, 9))
+        assert build_list == [target]
@@ -9,7 +9,7 @@
 import sys
 
 import pytest
-from movoid_function import Function, ReplaceFunction, replace_function, restore_function
+from movoid_function import Function, ReplaceFunction, ReplaceTransaction, replace_function, restore_function, STACK
 
 
 class Test_class_Function:
@@ -154,3 +154,220 @@ class Test_class_ReplaceFunction:
         replace_function(do_origin, do_replace_class_function, setup=-1)
         do_origin(test_list)
         assert test_list[0] == 22 and test_list[1] == 2 and test_list[2] == 3
+
+    def test_03_flat_plan(self):
+        order = []
+
+        def record(name):
+            def func(x):
+                order.append(name)
+                return name + str(x)
+
+            return func
+
+        restore_function(do_origin)
+        replace_function(do_origin, record('a'))
+        replace_function(do_origin, record('b'), setup=-1)
+        replace_function(do_origin, record('c'), setup=-1, teardown=1)
+        assert do_origin.get_plan()[0] == tuple(do_origin.history[1:3])
+        assert do_origin(1) == 'c1'
+        assert order == ['a', 'b', 'c', 'a']
+        assert do_origin.setup_return == 'b1' and do_origin.main_return == 'c1' and do_origin.teardown_return == 'a1'
+        order.clear()
+        do_origin.index = 2
+        assert do_origin(2) == 'b2' and order == ['a', 'b']
+        assert do_origin.call(-1, refresh_return=False)(3) == 'c3' and do_origin.main_return == 'b2'
+        do_origin.history[2] = record('d')
+        assert do_origin.refresh_plan()(4) == 'd4' and order[-2:] == ['a', 'd']
+        restore_function(do_origin)
+
+    def test_04_context_local_state(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        def add_ten(x):
+            return x + 10
+
+        restore_function(do_origin)
+        replace_function(do_origin, add_ten)
+
+        def run_in_thread(x):
+            if x % 2:
+                do_origin.multi_use_ori()
+            result = do_origin([x]) if x % 2 else do_origin(x)
+            main_return, index = do_origin.main_return, do_origin.index
+            if x % 2:
+                do_origin.multi_use_last()
+            return result, main_return, index
+
+        with ThreadPoolExecutor(4) as executor:
+            result_list = list(executor.map(run_in_thread, range(40)))
+        for x, (result, main_return, index) in enumerate(result_list):
+            assert main_return is result
+            assert (result, index) == (([x + 1], 0) if x % 2 else (x + 10, 1))
+        assert do_origin.index == 1 and do_origin.main_return is None
+
+        async def run_in_task(x):
+            do_origin.multi_use_ori()
+            do_origin.multi_use_ori()
+            do_origin.multi_use_last()
+            await asyncio.sleep(0)
+            first = do_origin([x])
+            do_origin.multi_use_last()
+            await asyncio.sleep(0)
+            return first, do_origin(x), do_origin.main_return
+
+        async def gather():
+            return await asyncio.gather(*[run_in_task(_) for _ in range(10)])
+
+        for x, (first, second, main_return) in enumerate(asyncio.run(gather())):
+            assert first == [x + 1] and second == main_return == x + 10
+        restore_function(do_origin)
+
+    def test_05_replace_transaction(self):
+        import json
+        import os.path
+        from types import ModuleType
+
+        def fake_dumps(obj, **kwargs):
+            return 'fake'
+
+        def fake_join(*args):
+            return 'joined'
+
+        def not_in_module():
+            pass
+
+        alias_module = ModuleType('test_alias_module')
+        exec('from json import dumps', alias_module.__dict__)
+        transaction = ReplaceTransaction(rebind_alias=True, module_list=[json, os.path, alias_module])
+        transaction.add(json.dumps, fake_dumps).add(os.path.join, fake_join)
+        with transaction:
+            assert json.dumps([1]) == 'fake' and os.path.join('a', 'b') == 'joined'
+            assert alias_module.dumps is json.dumps and type(alias_module.dumps) is ReplaceFunction
+            transaction.add(do_origin, do_replace)
+            assert do_origin([1]) == [3]
+        assert json.dumps([1]) == '[1]' and os.path.join('a', 'b') == os.sep.join(['a', 'b'])
+        assert alias_module.dumps is json.dumps and type(do_origin) is not ReplaceFunction
+
+        not_in_module.__module__ = 'json'
+        transaction = ReplaceTransaction().add(json.dumps, fake_dumps).add(not_in_module, fake_join)
+        with pytest.raises(AttributeError):
+            transaction.apply()
+        assert json.dumps([1]) == '[1]' and not transaction.active
+        assert len(transaction._todo_list) == 2
+
+        restore_function(do_origin)
+        replace_function(do_origin, do_replace)
+        history_count = len(do_origin.history)
+        transaction = ReplaceTransaction().add(do_origin, fake_join).add(json.dumps, fake_dumps).add(not_in_module, fake_join)
+        with pytest.raises(AttributeError):
+            transaction.apply()
+        assert len(do_origin.history) == history_count and do_origin([1]) == [3]
+        assert json.dumps([1]) == '[1]' and len(transaction._todo_list) == 3
+        restore_function(do_origin)
+
+    def test_06_shadow_traffic(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def new_origin(x):
+            if x[0] < 0:
+                raise ValueError(x)
+            return [x[0] + 1] if x[0] < 5 else [0]
+
+        restore_function(do_origin)
+        replace_function(do_origin, lambda x: [x[0] + 1])
+        replace_function(do_origin, new_origin)
+        do_origin.index = 1
+        executor = ThreadPoolExecutor(1)
+        stats = do_origin.start_shadow(index=-1, executor=executor)
+        assert do_origin.shadow_stats is stats
+        result_list = [do_origin([_]) for _ in (-1, 0, 1, 2, 5)]
+        assert do_origin.stop_shadow() is stats and do_origin.shadow_stats is None
+        do_origin([7])
+        executor.shutdown(wait=True)
+        assert result_list == [[0], [1], [2], [3], [6]] and do_origin.main_return == [8]
+        info = stats.info()
+        assert (info['submitted'], info['pending'], info['matched'], info['mismatched'], info['errors']) == (5, 0, 3, 1, 1)
+        assert info['primary_mean'] > 0 and info['shadow_mean'] > 0
+        assert [_[2:] for _ in stats.mismatch_list if not isinstance(_[3], Exception)] == [([6], [0])]
+
+        stats = do_origin.start_shadow(index=1, rate=0)
+        do_origin([1])
+        assert stats.info()['submitted'] == 0
+        do_origin.stop_shadow()
+        restore_function(do_origin)
+
+    def test_07_canary_routing(self):
+        def canary(x):
+            if x[0] < 0:
+                raise ValueError(x)
+            return [x[0] + 100]
+
+        restore_function(do_origin)
+        replace_function(do_origin, canary)
+        routing = do_origin.set_route({0: 3, -1: 1})
+        assert do_origin.routing is routing
+        result_list = [do_origin([0])[0] for _ in range(4000)]
+        info = routing.info()
+        assert info[0]['count'] + info[1]['count'] == 4000 and info[1]['count'] == result_list.count(100)
+        assert 800 < info[1]['count'] < 1200 and info[1]['share'] == 0.25
+        assert 0 < info[0]['p50'] <= info[0]['p99'] and sum(routing.record_dict[1].histogram) == info[1]['count']
+        do_origin.multi_use_ori()
+        assert do_origin([0]) == [1]
+        do_origin.multi_use_last()
+        assert sum(_['count'] for _ in routing.info().values()) == 4000
+
+        routing = do_origin.set_route([0, 1])
+        with pytest.raises(ValueError):
+            do_origin([-1])
+        assert routing.info()[1]['errors'] == 1 and do_origin([1]) == [101]
+        with pytest.raises(ValueError):
+            do_origin.set_route({0: 0})
+        do_origin.use_ori()
+        assert do_origin.routing is None and do_origin([1]) == [2]
+        restore_function(do_origin)
+
+    def test_08_setup_caller(self):
+        caller_list = []
+
+        def setup_func(x):
+            caller_list.append(STACK.get_frame(1).info())
+
+        def teardown_func(x):
+            caller_list.append(STACK.get_frame(1).info())
+
+        restore_function(do_origin)
+        replace_function(do_origin, setup_func)
+        replace_function(do_origin, teardown_func)
+        replace_function(do_origin, do_replace, setup=1, teardown=2)
+        lineno = sys._getframe().f_lineno + 1
+        do_origin([1])
+        assert caller_list == [f'{__name__}:{lineno}:test_08_setup_caller'] * 2
+        restore_function(do_origin)
+
+    def test_09_return_not_kept_by_context(self):
+        import gc
+        import weakref
+
+        class Result:
+            pass
+
+        replaced = ReplaceFunction(do_origin, lambda x: Result())
+        result_ref = weakref.ref(replaced([1]))
+        assert replaced.main_return is result_ref()
+        del replaced
+        gc.collect()
+        assert result_ref() is None
+
+    def test_10_return_store_released(self):
+        replaced_list = [ReplaceFunction(do_origin, do_replace) for _ in range(100)]
+        for replaced in replaced_list:
+            replaced([1])
+            replaced.multi_use_ori()
+            replaced.multi_use_last()
+        replaced = replaced_list[0]
+        for _ in range(10):
+            replaced([1])
+        assert len(replaced._return_store) == 1
+        assert replaced._state.get()[3] is None
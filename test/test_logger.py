@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : test_logger
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 20:00
+# Description   : 
+"""
+import logging
+import sys
+
+from movoid_function import STACK, StackLogger, use_stack_caller, wraps
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def create_logger(name):
+    logger = StackLogger(name)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger, handler
+
+
+def pass_through_dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class Test_class_StackLogger:
+    def test_01_direct_caller(self):
+        logger, handler = create_logger('test_logger_01')
+        line = sys._getframe().f_lineno + 1
+        logger.info('hello')
+        record = handler.records[0]
+        assert record.funcName == 'test_01_direct_caller'
+        assert record.lineno == line
+        assert record.module == 'test_logger'
+
+    def test_02_skip_ignored_helper(self):
+        logger, handler = create_logger('test_logger_02')
+
+        @STACK.ignore_function
+        def log_helper(text):
+            logger.info(text)
+
+        lines = []
+
+        @pass_through_dec
+        def caller():
+            lines.append(sys._getframe().f_lineno + 1)
+            log_helper('hello')
+
+        caller()
+        assert handler.records[0].funcName == 'caller'
+        assert handler.records[0].lineno == lines[0]
+
+    def test_03_stacklevel_and_stack_info(self):
+        logger, handler = create_logger('test_logger_03')
+
+        @pass_through_dec
+        def caller():
+            logger.info('hello', stacklevel=2, stack_info=True)
+
+        caller()
+        record = handler.records[0]
+        assert record.funcName == 'wrapper'
+        assert record.lineno == pass_through_dec.__code__.co_firstlineno + 3
+        assert record.stack_info.startswith('Stack (most recent call last):')
+
+    def test_04_use_stack_caller(self):
+        logger = logging.getLogger('test_logger_04')
+        handler = ListHandler()
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        use_stack_caller(logger)
+
+        @STACK.ignore_function
+        def log_helper():
+            logger.info('hello')
+
+        log_helper()
+        assert handler.records[0].funcName == 'test_04_use_stack_caller'
+
+    def test_05_stacklevel_too_large(self):
+        logger, handler = create_logger('test_logger_05')
+        logger.info('hello', stacklevel=10000)
+        outer_frame = sys._getframe()
+        while outer_frame.f_back is not None:
+            outer_frame = outer_frame.f_back
+        record = handler.records[0]
+        assert (record.pathname, record.lineno, record.funcName) == (outer_frame.f_code.co_filename, outer_frame.f_lineno, outer_frame.f_code.co_name)
@@ -0,0 +1,65 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+# File          : test_profiler
+# Author        : Sun YiFan-Movoid
+# Time          : 2026/10/17 18:00
+# Description   : 
+"""
+import io
+
+from movoid_function import DECORATION_PROFILER, wraps, wraps_add_one, decorate_class_function_include
+
+
+def pass_through_dec(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class Test_class_DecorationProfiler:
+    def test_01_record_by_module(self):
+        DECORATION_PROFILER.clear()
+        DECORATION_PROFILER.enable(trace_memory=False)
+        try:
+            @pass_through_dec
+            def target(a, b=2):
+                return a + b
+
+            @wraps_add_one('c', 3)
+            def target_add(a, *args):
+                return a, args
+
+            @decorate_class_function_include(pass_through_dec, 'method')
+            class Target:
+                def method(self, a):
+                    return a
+        finally:
+            DECORATION_PROFILER.disable()
+        assert target(1) == 3
+        assert target_add(1) == (1, (3,))
+        assert Target().method(4) == 4
+        record_dict = {(_[0], _[1]): _[2] for _ in DECORATION_PROFILER.records()}
+        assert record_dict == {
+            (__name__, 'wraps'): 2,
+            (__name__, 'wraps_add_one'): 1,
+            (__name__, 'decorate_class_function_include'): 1,
+        }
+        DECORATION_PROFILER.clear()
+
+    def test_02_report(self):
+        DECORATION_PROFILER.clear()
+        DECORATION_PROFILER.enable()
+        try:
+            @pass_through_dec
+            def target(a):
+                return a
+        finally:
+            DECORATION_PROFILER.disable()
+        output = io.StringIO()
+        text = DECORATION_PROFILER.report(file=output)
+        assert output.getvalue() == text
+        assert text.splitlines()[1].split()[:3] == [__name__, 'wraps', '1']
+        DECORATION_PROFILER.clear()
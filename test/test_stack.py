@@ -52,3 +52,116 @@ class Test_class_Stack:
         assert print_list[6] == 'temp1 end'
         assert print_list[7] == 'temp2 end'
         STACK.self_check()
+
+    def test_05_ignore_index(self):
+        def inner():
+            return STACK.get_frame(1)
+
+        def outer():
+            return inner()
+
+        assert STACK.get_frame_list()[0].info(stack.OnlyFunction) == 'test_05_ignore_index'
+        assert outer().info(stack.OnlyFunction) == 'outer'
+        assert any(_[0] is outer.__code__ for _ in stack.Stack._registry.decision_cache.values())
+        version = STACK.version
+        lineno = outer.__code__.co_firstlineno + 1
+        STACK.this_file_lineno_should_ignore(lineno, check_text='return inner()')
+        try:
+            assert STACK.version == version + 1 and not stack.Stack._registry.decision_cache
+            assert outer().info(stack.OnlyFunction) == 'test_05_ignore_index'
+            STACK.self_check()
+        finally:
+            assert STACK.remove_ignore(STACK.get_frame()._module, lineno)
+        assert outer().info(stack.OnlyFunction) == 'outer'
+
+    def test_06_ignore_function(self):
+        @STACK.ignore_function
+        def helper():
+            return STACK.get_frame()
+
+        @STACK.ignore_function(ignore_level=stack.UI)
+        def ui_helper():
+            return helper()
+
+        assert helper().info(stack.OnlyFunction) == 'test_06_ignore_function'
+        assert ui_helper().info(stack.OnlyFunction) == 'test_06_ignore_function'
+        assert STACK.get_frame_list(skip_ignore_level=stack.DEBUG)[0].info(stack.OnlyFunction) == 'test_06_ignore_function'
+        assert id(helper.__code__) in stack.Stack.ignore_code_dict
+
+    def test_07_iter_frames(self):
+        def recursion(depth):
+            if depth <= 0:
+                return STACK.iter_frames(with_stack_level=True)
+            return recursion(depth - 1)
+
+        frame_iter = recursion(100)
+        assert next(frame_iter)[0].info(stack.OnlyFunction) == 'recursion'
+        assert next(frame_iter)[1] == 1
+        full_list = STACK.get_frame_list(with_stack_level=True)
+        short_list = STACK.get_frame_list(with_stack_level=True, max_frames=2)
+        assert [(_[0].info(stack.OnlyFunction), _[1]) for _ in short_list] == [(_[0].info(stack.OnlyFunction), _[1]) for _ in full_list[:2]]
+        stop_list = STACK.get_frame_list(stop_module='_pytest')
+        assert stop_list[0].info(stack.OnlyFunction) == 'test_07_iter_frames'
+        assert all(not _._module.startswith('_pytest') for _ in stop_list)
+        assert len(stop_list) < len(full_list)
+
+    def test_08_self_check_all_entries(self):
+        for lineno in (1, 2):
+            stack_frame = stack.StackFrame(('test_self_check_module', lineno), self_check_str=f'wrong text {lineno}')
+            stack_frame._file_path = pathlib.Path(__file__)
+            STACK.should_ignore(stack_frame, add_it=True)
+        try:
+            STACK.self_check()
+        except AssertionError as err:
+            assert 'wrong text 1' in str(err) and 'wrong text 2' in str(err)
+        else:
+            raise AssertionError('self check should fail')
+        finally:
+            assert STACK.remove_ignore('test_self_check_module', 1) and STACK.remove_ignore('test_self_check_module', 2)
+        assert 'test_self_check_module' not in STACK.ignore_dict
+        assert STACK.self_check(background=True).result() is None
+
+
+class Test_class_StackFrame:
+    def test_01_lazy_file_path(self):
+        stack_frame = STACK.get_frame()
+        assert not hasattr(stack_frame, '__dict__')
+        assert stack_frame._file_path_value is None
+        assert stack_frame.file_full == str(pathlib.Path(__file__).resolve())
+        assert stack_frame._file_path is stack.FILE_PATH_CACHE[__file__]
+        assert stack_frame._module_list is STACK.get_frame()._module_list
+
+    def test_02_info_cache(self):
+        stack_frame = STACK.get_frame()
+        info = stack_frame.info(stack.PathFunction)
+        assert info == f'{pathlib.Path(__file__).resolve()}:{stack_frame._lineno}:test_02_info_cache'
+        assert stack_frame.info(stack.PathFunction) is info
+        assert STACK(stack_frame).info(stack.PathFunction) is info
+        assert stack.FrameSnapshot(stack_frame._module, stack_frame._lineno, stack_frame._code).info(stack.PathFunction) is info
+        assert stack_frame.info(stack.OnlyFunction) == 'test_02_info_cache'
+
+
+class Test_class_FrameSnapshot:
+    def test_01_no_frame_reference(self):
+        import weakref
+
+        class Local:
+            pass
+
+        def capture():
+            local_value = Local()
+            return STACK.get_frame(snapshot=True), weakref.ref(local_value)
+
+        snapshot, local_ref = capture()
+        assert isinstance(snapshot, stack.FrameSnapshot)
+        assert local_ref() is None
+        assert snapshot.func_name == 'capture'
+        assert snapshot.info(stack.ModuleFunction) == f'{__name__}:{snapshot.lineno}:capture'
+        assert snapshot.to_stack_frame().info(stack.PathFunction) == f'{pathlib.Path(__file__).resolve()}:{snapshot.lineno}:capture'
+
+    def test_02_format_in_background(self):
+        snapshot_list = STACK.get_frame_list(snapshot=True)
+        assert all(isinstance(_, stack.FrameSnapshot) for _ in snapshot_list)
+        info_list = STACK.format_snapshots(snapshot_list, stack.OnlyFunction).result()
+        assert info_list[0] == 'test_02_format_in_background'
+        assert len(info_list) == len(snapshot_list)